@@ -0,0 +1,214 @@
+"""
+Движок ценовых алертов, вычисляемый на каждой сохраненной цене.
+
+Правила хранятся в таблице alert_rules и индексируются в памяти воркера:
+- cross_above / cross_below: отсортированные пороги по тикеру. На каждом тике
+  бинарным поиском берутся только пороги между предыдущей и новой ценой -
+  O(log n + k), где k - число сработавших правил.
+- move_pct: правила сгруппированы по окну (минуты) и отсортированы по проценту.
+  Для каждого окна один индексный запрос min/max, затем bisect по проценту.
+
+Уведомления уходят через подключаемый sink (ALERT_SINK=log|webhook), но не
+из цикла сбора: evaluate только отмечает срабатывания, а отправку делает
+отдельная задача Celery (tasks.deliver_alerts) с повторами. Медленный webhook
+не задерживает запись цен, а неудачная отправка не теряется. Доставка
+"как минимум один раз": получатель отсеивает повторы по alert_id.
+"""
+import json
+import os
+import urllib.request
+from bisect import bisect_left, bisect_right
+from typing import Callable, Dict, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from . import crud, models
+
+ALERT_SINK = os.getenv("ALERT_SINK", "log")
+ALERT_WEBHOOK_URL = os.getenv("ALERT_WEBHOOK_URL", "")
+
+
+# ---------- Sinks ----------
+
+class AlertSink:
+    """Базовый sink: получает список сработавших алертов"""
+
+    def send(self, alerts: List[dict]):
+        raise NotImplementedError
+
+
+class LogSink(AlertSink):
+    def send(self, alerts: List[dict]):
+        for alert in alerts:
+            print(f"🔔 Alert #{alert['rule_id']} {alert['ticker']} {alert['kind']} "
+                  f"{alert['threshold']}: price {alert['price']}")
+
+
+class WebhookSink(AlertSink):
+    def __init__(self, url: str = ALERT_WEBHOOK_URL, timeout: float = 5):
+        if not url:
+            raise ValueError("ALERT_WEBHOOK_URL is not set")
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, alerts: List[dict]):
+        # Один POST на пачку алертов тика
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps({"alerts": alerts}).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            if response.status >= 400:
+                raise Exception(f"Webhook error: {response.status}")
+
+
+SINKS: Dict[str, Callable[[], AlertSink]] = {
+    "log": LogSink,
+    "webhook": WebhookSink,
+}
+
+
+def register_sink(name: str, factory: Callable[[], AlertSink]):
+    """Регистрирует пользовательский sink для ALERT_SINK=<name>"""
+    SINKS[name] = factory
+
+
+# ---------- Индекс правил ----------
+
+class _SortedRules:
+    """Параллельные отсортированные списки (ключ, id правила)"""
+
+    def __init__(self):
+        self.keys: List[float] = []
+        self.ids: List[int] = []
+
+    def add(self, key: float, rule_id: int):
+        index = bisect_right(self.keys, key)
+        self.keys.insert(index, key)
+        self.ids.insert(index, rule_id)
+
+
+class AlertIndex:
+    def __init__(self, rules: List[models.AlertRule]):
+        self.rules: Dict[int, models.AlertRule] = {}
+        self.above: Dict[str, _SortedRules] = {}
+        self.below: Dict[str, _SortedRules] = {}
+        self.moves: Dict[str, Dict[int, _SortedRules]] = {}
+        for rule in rules:
+            self.add(rule)
+
+    def add(self, rule: models.AlertRule):
+        self.rules[rule.id] = rule
+        if rule.kind == "cross_above":
+            self.above.setdefault(rule.ticker, _SortedRules()).add(rule.threshold, rule.id)
+        elif rule.kind == "cross_below":
+            self.below.setdefault(rule.ticker, _SortedRules()).add(rule.threshold, rule.id)
+        elif rule.kind == "move_pct":
+            windows = self.moves.setdefault(rule.ticker, {})
+            windows.setdefault(rule.window_minutes, _SortedRules()).add(rule.threshold, rule.id)
+
+    @property
+    def tickers(self) -> Set[str]:
+        """Тикеры, для которых есть хотя бы одно правило"""
+        return set(self.above) | set(self.below) | set(self.moves)
+
+    def crossed(self, ticker: str, prev_price: float, price: float) -> List[int]:
+        """Правила, порог которых лежит между предыдущей и новой ценой"""
+        if price > prev_price and ticker in self.above:
+            # prev < X <= price
+            rules = self.above[ticker]
+            return rules.ids[bisect_right(rules.keys, prev_price):bisect_right(rules.keys, price)]
+        if price < prev_price and ticker in self.below:
+            # price <= X < prev
+            rules = self.below[ticker]
+            return rules.ids[bisect_left(rules.keys, price):bisect_left(rules.keys, prev_price)]
+        return []
+
+    def windows(self, ticker: str) -> List[int]:
+        return list(self.moves.get(ticker, {}))
+
+    def moved(self, ticker: str, window_minutes: int, move_pct: float) -> List[int]:
+        """Правила окна с порогом не выше фактического движения"""
+        rules = self.moves[ticker][window_minutes]
+        return rules.ids[:bisect_right(rules.keys, move_pct)]
+
+
+# ---------- Движок ----------
+
+class AlertEngine:
+    """Держит индекс правил воркера и перезагружает его при изменении правил"""
+
+    def __init__(self, sink: Optional[AlertSink] = None):
+        self._sink = sink
+        self._index: Optional[AlertIndex] = None
+        self._version: Optional[int] = None
+
+    @property
+    def sink(self) -> AlertSink:
+        if self._sink is None:
+            self._sink = SINKS[ALERT_SINK]()
+        return self._sink
+
+    def _refresh(self, db: Session) -> AlertIndex:
+        # Дешевая проверка версии; полная перезагрузка только при изменениях через API
+        version = crud.get_alert_rules_version(db)
+        if self._index is None or version != self._version:
+            rules = crud.get_alert_rules(db, active_only=True)
+            # Правила живут дольше сессии - отвязываем, чтобы commit их не expire'ил
+            for rule in rules:
+                db.expunge(rule)
+            self._index = AlertIndex(rules)
+            self._version = version
+            print(f"🔔 Loaded {len(rules)} alert rules")
+        return self._index
+
+    def watched(self, db: Session) -> Set[str]:
+        """Тикеры с активными правилами - остальные новые цены проверять незачем"""
+        return self._refresh(db).tickers
+
+    def evaluate(self, db: Session, ticker: str, prev_price: Optional[float],
+                 price: float, timestamp: int) -> List[dict]:
+        """Проверяет правила тикера на новой цене; возвращает сработавшие для deliver"""
+        index = self._refresh(db)
+
+        candidates: List[int] = []
+        if prev_price is not None:
+            candidates.extend(index.crossed(ticker, prev_price, price))
+
+        for window_minutes in index.windows(ticker):
+            low, high = crud.get_price_range(db, ticker, since=timestamp - window_minutes * 60)
+            if not low or not high:
+                continue
+            move_pct = max((price - low) / low, (high - price) / high) * 100
+            candidates.extend(index.moved(ticker, window_minutes, move_pct))
+
+        if not candidates:
+            return []
+
+        # Атомарно отмечаем срабатывание; move_pct не чаще раза за окно,
+        # даже если тик обрабатывают несколько воркеров
+        fired_ids = crud.mark_alert_rules_triggered(db, candidates, timestamp)
+        alerts = []
+        for rule_id in fired_ids:
+            rule = index.rules[rule_id]
+            alerts.append({
+                "alert_id": f"{rule.id}-{timestamp}",
+                "rule_id": rule.id,
+                "ticker": ticker,
+                "kind": rule.kind,
+                "threshold": rule.threshold,
+                "window_minutes": rule.window_minutes,
+                "price": price,
+                "prev_price": prev_price,
+                "timestamp": timestamp,
+            })
+        return alerts
+
+    def deliver(self, alerts: List[dict]):
+        """Отправляет алерты в sink; исключение - сигнал задаче повторить отправку"""
+        self.sink.send(alerts)
+
+
+alert_engine = AlertEngine()
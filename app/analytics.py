@@ -0,0 +1,53 @@
+"""
+Векторные вычисления над ценовыми рядами (numpy).
+"""
+from typing import Tuple
+
+import numpy as np
+
+
+def align_asof(base_ts: np.ndarray, base_prices: np.ndarray,
+               quote_ts: np.ndarray, quote_prices: np.ndarray,
+               tolerance: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    As-of merge join двух отсортированных рядов: каждой точке base сопоставляется
+    последняя точка quote не позже нее и не старше tolerance секунд.
+    Точки base без пары отбрасываются.
+    """
+    if not len(base_ts) or not len(quote_ts):
+        empty = np.array([], dtype=np.int64)
+        return empty, np.array([], dtype=float), np.array([], dtype=float)
+    idx = np.searchsorted(quote_ts, base_ts, side="right") - 1
+    matched = idx >= 0
+    safe_idx = np.where(matched, idx, 0)
+    matched &= (base_ts - quote_ts[safe_idx]) <= tolerance
+    return base_ts[matched], base_prices[matched], quote_prices[safe_idx[matched]]
+
+
+def rolling_correlation(x: np.ndarray, y: np.ndarray, window: int) -> np.ndarray:
+    """
+    Скользящая корреляция Пирсона лог-доходностей x и y по окну из window точек.
+    Результат той же длины, что x; там, где окно еще не набрано, - NaN.
+    """
+    result = np.full(len(x), np.nan)
+    if window < 2 or len(x) <= window:
+        return result
+
+    rx = np.diff(np.log(x))
+    ry = np.diff(np.log(y))
+
+    def window_sums(values):
+        cumsum = np.concatenate(([0.0], np.cumsum(values)))
+        return cumsum[window:] - cumsum[:-window]
+
+    sx, sy = window_sums(rx), window_sums(ry)
+    sxx, syy, sxy = window_sums(rx * rx), window_sums(ry * ry), window_sums(rx * ry)
+
+    cov = sxy - sx * sy / window
+    var_x = sxx - sx * sx / window
+    var_y = syy - sy * sy / window
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = cov / np.sqrt(var_x * var_y)
+    # Окно доходностей [i - window, i) заканчивается на цене с индексом i
+    result[window:] = np.clip(corr, -1.0, 1.0)
+    return result
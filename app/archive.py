@@ -0,0 +1,332 @@
+"""
+Холодный архив ticker_data в сжатых Parquet-файлах.
+
+Строки старше ARCHIVE_AFTER_DAYS дней переносятся из БД в файлы
+ARCHIVE_DIR/<ticker>/<YYYY-MM>.parquet (zstd). В памяти держится индекс
+диапазонов времени файлов, поэтому crud может прозрачно дочитывать историю
+из архива. Файлы сжаты, поэтому при открытии месячный файл целиком
+распаковывается в память; открытые файлы держит LRU-кэш на
+ARCHIVE_CACHE_FILES файлов.
+
+Архив выключен, пока не задан ARCHIVE_DIR: строки удаляются из БД, поэтому
+каталог должен быть постоянным и общим для web и Celery (volume), а не
+относительным каталогом внутри контейнера. Архивируется только ticker_data:
+при STORAGE_LAYOUT=compact строки живут в ticker_prices, и архив не включается.
+
+Запуск архивации:
+    ARCHIVE_DIR=/data/archive python -m app.archive --days 90
+"""
+import argparse
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import text
+
+from .compact import COMPACT_LAYOUT
+
+ARCHIVE_DIR: Optional[Path] = Path(os.environ["ARCHIVE_DIR"]) if os.getenv("ARCHIVE_DIR") else None
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "0"))  # 0 - не архивировать
+ARCHIVE_CACHE_FILES = int(os.getenv("ARCHIVE_CACHE_FILES", "64"))
+ARCHIVE_ENABLED = ARCHIVE_DIR is not None and ARCHIVE_AFTER_DAYS > 0 and not COMPACT_LAYOUT
+
+# Меняется после каждой архивации - по нему читатели видят новые файлы
+VERSION_FILE_NAME = ".version"
+
+SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("price", pa.float64()),
+    ("timestamp", pa.int64()),
+    ("created_at", pa.timestamp("us", tz="UTC")),
+])
+
+
+class ArchivedRow(NamedTuple):
+    """Строка из архива с теми же полями, что и TickerData"""
+    id: int
+    ticker: str
+    price: float
+    timestamp: int
+    created_at: Optional[datetime]
+
+
+class ArchiveFile:
+    """Колонки одного месячного файла (распакованы в память)"""
+
+    def __init__(self, ticker: str, path: Path):
+        self.ticker = ticker
+        self.path = path
+        self.table = pq.read_table(path, memory_map=True)
+        # Файлы пишутся отсортированными по timestamp
+        self.timestamps = self.table.column("timestamp").to_numpy()
+        self.prices = self.table.column("price").to_numpy()
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def row(self, i: int) -> ArchivedRow:
+        return ArchivedRow(
+            id=self.table.column("id")[i].as_py(),
+            ticker=self.ticker,
+            price=float(self.prices[i]),
+            timestamp=int(self.timestamps[i]),
+            created_at=self.table.column("created_at")[i].as_py(),
+        )
+
+    def nearest(self, target: int) -> Optional[int]:
+        """Индекс ближайшей по времени строки; при равенстве - более поздней"""
+        if not len(self):
+            return None
+        i = int(np.searchsorted(self.timestamps, target, side="right"))
+        if i == 0:
+            return 0
+        if i == len(self):
+            return i - 1
+        # timestamps[i - 1] <= target < timestamps[i]
+        return i if self.timestamps[i] - target <= target - self.timestamps[i - 1] else i - 1
+
+
+class _FileMeta(NamedTuple):
+    min_ts: int
+    max_ts: int
+    num_rows: int
+    path: Path
+
+
+class ArchiveStore:
+    """Индекс диапазонов архивных файлов + LRU-кэш открытых файлов"""
+
+    def __init__(self, root: Optional[Path] = ARCHIVE_DIR, cache_files: int = ARCHIVE_CACHE_FILES):
+        self.root = root
+        self.cache_files = cache_files
+        self._lock = threading.Lock()
+        self._version: Optional[float] = None
+        self._index: Dict[str, List[_FileMeta]] = {}
+        self._files: "OrderedDict[Path, ArchiveFile]" = OrderedDict()
+
+    def _current_version(self) -> Optional[float]:
+        if self.root is None:
+            return None
+        try:
+            return (self.root / VERSION_FILE_NAME).stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+    def _files_for(self, ticker: str) -> List[_FileMeta]:
+        # Один stat на запрос; полное перестроение индекса - только после архивации
+        version = self._current_version()
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._index = self._build_index()
+                    self._files.clear()
+                    self._version = version
+        return self._index.get(ticker, [])
+
+    def _build_index(self) -> Dict[str, List[_FileMeta]]:
+        index: Dict[str, List[_FileMeta]] = {}
+        if self.root is None or not self.root.is_dir():
+            return index
+        for ticker_dir in self.root.iterdir():
+            if not ticker_dir.is_dir():
+                continue
+            metas = []
+            for path in ticker_dir.glob("*.parquet"):
+                # Диапазон берем из статистики row group'ов - без чтения данных
+                metadata = pq.ParquetFile(path).metadata
+                column = metadata.schema.names.index("timestamp")
+                stats = [metadata.row_group(i).column(column).statistics for i in range(metadata.num_row_groups)]
+                stats = [s for s in stats if s is not None and s.has_min_max]
+                if not stats:
+                    continue
+                metas.append(_FileMeta(
+                    min_ts=min(s.min for s in stats),
+                    max_ts=max(s.max for s in stats),
+                    num_rows=metadata.num_rows,
+                    path=path,
+                ))
+            index[ticker_dir.name] = sorted(metas)
+        return index
+
+    def _open(self, ticker: str, meta: _FileMeta) -> ArchiveFile:
+        with self._lock:
+            archive_file = self._files.get(meta.path)
+            if archive_file is not None:
+                self._files.move_to_end(meta.path)
+                return archive_file
+        archive_file = ArchiveFile(ticker, meta.path)
+        with self._lock:
+            self._files[meta.path] = archive_file
+            while len(self._files) > self.cache_files:
+                self._files.popitem(last=False)
+        return archive_file
+
+    def distance(self, ticker: str, target: int) -> Optional[int]:
+        """Расстояние от target до покрытого архивом диапазона (0 - внутри)"""
+        files = self._files_for(ticker)
+        if not files:
+            return None
+        low, high = files[0].min_ts, max(f.max_ts for f in files)
+        if low <= target <= high:
+            return 0
+        return low - target if target < low else target - high
+
+    def nearest(self, ticker: str, target: int) -> Optional[ArchivedRow]:
+        """Ближайшая к target архивная строка"""
+        files = self._files_for(ticker)
+        if not files:
+            return None
+        # Кандидаты: файл, содержащий target, и соседи слева/справа
+        starts = [f.min_ts for f in files]
+        pos = int(np.searchsorted(starts, target, side="right"))
+        best = None
+        for meta in files[max(pos - 1, 0):pos + 1]:
+            archive_file = self._open(ticker, meta)
+            i = archive_file.nearest(target)
+            if i is None:
+                continue
+            row = archive_file.row(i)
+            if best is None or (abs(row.timestamp - target), -row.timestamp) < (abs(best.timestamp - target), -best.timestamp):
+                best = row
+        return best
+
+    def count(self, ticker: str) -> int:
+        return sum(f.num_rows for f in self._files_for(ticker))
+
+    def read_desc(self, ticker: str, skip: int, limit: int) -> List[ArchivedRow]:
+        """Страница архивной истории от новых к старым"""
+        rows: List[ArchivedRow] = []
+        for meta in sorted(self._files_for(ticker), key=lambda f: f.max_ts, reverse=True):
+            if len(rows) >= limit:
+                break
+            # Целые файлы пропускаем по метаданным, не открывая
+            if skip >= meta.num_rows:
+                skip -= meta.num_rows
+                continue
+            archive_file = self._open(ticker, meta)
+            end = len(archive_file) - skip
+            start = max(end - (limit - len(rows)), 0)
+            rows.extend(archive_file.row(i) for i in range(end - 1, start - 1, -1))
+            skip = 0
+        return rows
+
+    def read_range(self, ticker: str, start: int, end: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Колонки timestamp и price архива в диапазоне [start, end], по возрастанию"""
+        timestamps, prices = [], []
+        for meta in self._files_for(ticker):
+            if meta.max_ts < start or meta.min_ts > end:
+                continue
+            archive_file = self._open(ticker, meta)
+            lo = int(np.searchsorted(archive_file.timestamps, start, side="left"))
+            hi = int(np.searchsorted(archive_file.timestamps, end, side="right"))
+            timestamps.append(archive_file.timestamps[lo:hi])
+            prices.append(archive_file.prices[lo:hi])
+        if not timestamps:
+            return np.array([], dtype=np.int64), np.array([], dtype=float)
+        return np.concatenate(timestamps), np.concatenate(prices)
+
+
+store = ArchiveStore()
+
+
+# ---------- Архивация ----------
+
+def _month_bounds(year: int, month: int) -> Tuple[int, int]:
+    start = datetime(year, month, 1, tzinfo=timezone.utc)
+    end = datetime(year + (month == 12), month % 12 + 1, 1, tzinfo=timezone.utc)
+    return int(start.timestamp()), int(end.timestamp())
+
+
+def _write_month(path: Path, new_table: pa.Table):
+    """Дописывает строки в месячный файл: merge, сортировка, дедуп по timestamp.
+    При повторе timestamp побеждает новая строка - это текущее значение из БД"""
+    if path.exists():
+        new_table = pa.concat_tables([pq.read_table(path), new_table])
+    timestamps = new_table.column("timestamp").to_numpy()
+    # Стабильная сортировка в обратном порядке строк: первой среди равных идет новая
+    reversed_order = np.arange(len(timestamps) - 1, -1, -1)
+    order = reversed_order[np.argsort(timestamps[reversed_order], kind="stable")]
+    _, first = np.unique(timestamps[order], return_index=True)
+    table = new_table.take(pa.array(order[first]))
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".parquet.tmp")
+    pq.write_table(table, tmp_path, compression="zstd", row_group_size=64 * 1024)
+    os.replace(tmp_path, path)
+
+
+def archive_old_rows(days: int = ARCHIVE_AFTER_DAYS, root: Optional[Path] = ARCHIVE_DIR) -> int:
+    """Переносит строки старше days дней в Parquet в каталоге root и удаляет их из БД"""
+    from .database import engine
+
+    if root is None:
+        raise RuntimeError("ARCHIVE_DIR is not set: refusing to delete rows without a persistent archive")
+    if days <= 0:
+        raise ValueError("days must be positive")
+    if COMPACT_LAYOUT:
+        raise RuntimeError("STORAGE_LAYOUT=compact: ticker_data is not written, there is nothing to archive")
+
+    cutoff = int((datetime.now(timezone.utc) - timedelta(days=days)).timestamp())
+    with engine.connect() as conn:
+        groups = conn.execute(text("""
+            SELECT DISTINCT ticker,
+                   EXTRACT(YEAR FROM to_timestamp(timestamp) AT TIME ZONE 'UTC')::int AS year,
+                   EXTRACT(MONTH FROM to_timestamp(timestamp) AT TIME ZONE 'UTC')::int AS month
+            FROM ticker_data
+            WHERE timestamp < :cutoff
+        """), {"cutoff": cutoff}).all()
+
+    archived = []
+    for ticker, year, month in groups:
+        start, end = _month_bounds(year, month)
+        end = min(end, cutoff)
+        with engine.connect() as conn:
+            rows = conn.execute(text("""
+                SELECT id, price, timestamp, created_at FROM ticker_data
+                WHERE ticker = :ticker AND timestamp >= :start AND timestamp < :end
+                ORDER BY timestamp
+            """), {"ticker": ticker, "start": start, "end": end}).all()
+        if not rows:
+            continue
+        ids, prices, timestamps, created = zip(*rows)
+        table = pa.table([
+            pa.array(ids, pa.int64()),
+            pa.array(prices, pa.float64()),
+            pa.array(timestamps, pa.int64()),
+            pa.array(created, pa.timestamp("us", tz="UTC")),
+        ], schema=SCHEMA)
+        _write_month(root / ticker / f"{year:04d}-{month:02d}.parquet", table)
+        archived.append(list(ids))
+        print(f"📦 Archived {ticker} {year:04d}-{month:02d}: {len(rows)} rows")
+
+    if not archived:
+        return 0
+
+    # Сначала публикуем файлы для читателей, потом удаляем строки из БД
+    root.mkdir(parents=True, exist_ok=True)
+    (root / VERSION_FILE_NAME).touch()
+
+    # Удаляем только записанные в архив id: строка, вставленная в тот же диапазон
+    # после чтения (например, повторный запуск слота), остается в БД до следующего раза
+    total = 0
+    for ids in archived:
+        with engine.begin() as conn:
+            total += conn.execute(text("DELETE FROM ticker_data WHERE id = ANY(:ids)"), {"ids": ids}).rowcount
+    print(f"✅ Moved {total} rows older than {days} days to {root}")
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move old ticker_data rows to Parquet archive")
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS or None, required=not ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--dir", type=Path, default=ARCHIVE_DIR, help="Каталог архива; по умолчанию ARCHIVE_DIR")
+    args = parser.parse_args()
+    if args.dir is None:
+        parser.error("set ARCHIVE_DIR or pass --dir")
+    archive_old_rows(days=args.days, root=args.dir)
@@ -0,0 +1,133 @@
+"""
+Статика дашборда: предсжатые (gzip, brotli) файлы из app/static с ETag по хешу содержимого.
+
+Файлы читаются и сжимаются один раз при старте. CSS/JS подключаются в
+index.html по адресу с хешем (?v=<hash>) и кэшируются браузером на год, но
+только если ?v совпадает с текущим хешем: старый или пустой v получает
+no-cache, иначе устаревший адрес навсегда закрепил бы новое содержимое.
+Сама страница отдается с no-cache, поэтому повторный визит стоит 304.
+"""
+import gzip
+import hashlib
+import mimetypes
+from pathlib import Path
+from typing import Dict, Optional
+
+from fastapi.responses import Response
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers, QueryParams
+from starlette.exceptions import HTTPException
+
+try:
+    import brotli
+except ImportError:  # без brotli отдаем только gzip
+    brotli = None
+
+STATIC_DIR = Path(__file__).parent / "static"
+STATIC_URL = "/static"
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# Порядок предпочтения кодировок
+ENCODINGS = ("br", "gzip")
+
+
+def _accepted_encodings(accept_encoding: str) -> set:
+    accepted = set()
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(token.strip().lower())
+    return accepted
+
+
+class Asset:
+    def __init__(self, body: bytes, media_type: str):
+        self.media_type = media_type
+        self.hash = hashlib.sha256(body).hexdigest()[:16]
+        self.variants: Dict[str, bytes] = {"identity": body}
+        compressed = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            compressed["br"] = brotli.compress(body, quality=11)
+        # Сжатый вариант храним, только если он действительно меньше
+        for encoding, data in compressed.items():
+            if len(data) < len(body):
+                self.variants[encoding] = data
+
+    def etag(self, encoding: str) -> str:
+        return f'"{self.hash}"' if encoding == "identity" else f'"{self.hash}-{encoding}"'
+
+    def response(self, headers: Headers, cache_control: str = REVALIDATE) -> Response:
+        accepted = _accepted_encodings(headers.get("accept-encoding", ""))
+        encoding = next((e for e in ENCODINGS if e in accepted and e in self.variants), "identity")
+
+        response_headers = {
+            "ETag": self.etag(encoding),
+            "Cache-Control": cache_control,
+            "Vary": "Accept-Encoding",
+        }
+        # Любой вариант этого же содержимого считается совпадением
+        if_none_match = headers.get("if-none-match", "")
+        known = {self.etag(e) for e in self.variants}
+        if any(tag.strip().removeprefix("W/") in known for tag in if_none_match.split(",")):
+            return Response(status_code=304, headers=response_headers)
+
+        if encoding != "identity":
+            response_headers["Content-Encoding"] = encoding
+        return Response(content=self.variants[encoding], media_type=self.media_type, headers=response_headers)
+
+
+class AssetStore:
+    """Предсжатые ассеты в памяти"""
+
+    def __init__(self, directory: Path = STATIC_DIR):
+        self.directory = directory
+        self.assets: Dict[str, Asset] = {}
+
+    def load(self):
+        self.assets = {}
+        for path in sorted(self.directory.iterdir()):
+            if not path.is_file() or path.name == "index.html":
+                continue
+            media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+            self.assets[path.name] = Asset(path.read_bytes(), media_type)
+
+        # В index.html подставляем адреса ассетов с хешем содержимого
+        html = (self.directory / "index.html").read_text(encoding="utf-8")
+        for name, asset in self.assets.items():
+            html = html.replace("{{ " + name + " }}", f"{STATIC_URL}/{name}?v={asset.hash}")
+        self.assets["index.html"] = Asset(html.encode("utf-8"), "text/html; charset=utf-8")
+
+        total = sum(len(a.variants["identity"]) for a in self.assets.values())
+        smallest = sum(min(len(v) for v in a.variants.values()) for a in self.assets.values())
+        print(f"✅ Loaded {len(self.assets)} dashboard assets ({total} bytes, {smallest} compressed)")
+
+    def get(self, name: str) -> Optional[Asset]:
+        if not self.assets:
+            self.load()
+        return self.assets.get(name)
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles, отдающий известные ассеты из предсжатого кэша"""
+
+    def __init__(self, store: AssetStore, **kwargs):
+        super().__init__(directory=store.directory, **kwargs)
+        self.store = store
+
+    async def get_response(self, path: str, scope) -> Response:
+        # Как в StaticFiles: кроме GET/HEAD - 405
+        if scope["method"] not in ("GET", "HEAD"):
+            raise HTTPException(status_code=405)
+        asset = self.store.get(path)
+        if asset is None:
+            return await super().get_response(path, scope)
+        # Навсегда кэшируем только адрес с актуальным хешем
+        version = QueryParams(scope.get("query_string", b"")).get("v")
+        cache_control = IMMUTABLE if version == asset.hash else REVALIDATE
+        return asset.response(Headers(scope=scope), cache_control)
+
+
+asset_store = AssetStore()
@@ -0,0 +1,190 @@
+"""
+Сбор цен по всем инструментам валюты: public/get_book_summary_by_currency.
+
+Один запрос возвращает сводку по всем фьючерсам и опционам валюты (тысячи
+объектов). Ответ разбирается потоково: тело читается кусками, объекты
+массива result декодируются по мере прихода, и из каждого сразу берутся
+только нужные поля - весь JSON в памяти не собирается.
+
+Валюты распределяются по шардам консистентным хешированием: у каждого
+шарда своя периодическая задача Celery, и при изменении BULK_SHARDS
+переезжает только ~1/N валют. С BULK_SHARD_QUEUES=1 задача шарда уходит
+в очередь bulk-<шард>, и воркер закрепляется за шардом через -Q.
+"""
+import asyncio
+import codecs
+import hashlib
+import json
+import os
+from bisect import bisect
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import aiohttp
+
+# dict.fromkeys - без повторов: "BTC,btc" иначе дал бы два запроса и дубли строк
+BULK_CURRENCIES = list(dict.fromkeys(
+    c.strip().upper() for c in os.getenv("BULK_CURRENCIES", "BTC,ETH").split(",") if c.strip()
+))
+BULK_KIND = os.getenv("BULK_KIND") or None  # future | option | ...; пусто - все инструменты
+BULK_SHARDS = int(os.getenv("BULK_SHARDS", "1"))
+BULK_SHARD_QUEUES = os.getenv("BULK_SHARD_QUEUES", "0") == "1"
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", "8"))
+BULK_PRICE_FIELD = os.getenv("BULK_PRICE_FIELD", "mark_price")
+BULK_TIMEOUT = float(os.getenv("BULK_TIMEOUT", "20"))
+BULK_RING_REPLICAS = 100
+CHUNK_SIZE = 64 * 1024
+
+
+# ---------- Консистентное хеширование ----------
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Кольцо с виртуальными узлами: ключ принадлежит первому узлу по часовой стрелке"""
+
+    def __init__(self, nodes: List[str], replicas: int = BULK_RING_REPLICAS):
+        self.nodes = list(nodes)
+        points = sorted((_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(replicas))
+        self._keys = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key: str) -> str:
+        index = bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._nodes[index]
+
+
+def shard_name(shard: int) -> str:
+    return f"bulk-{shard}"
+
+
+def assign_shards(currencies: List[str] = BULK_CURRENCIES, shards: int = BULK_SHARDS) -> Dict[int, List[str]]:
+    """Номер шарда -> его валюты"""
+    ring = HashRing([shard_name(shard) for shard in range(shards)])
+    assignment: Dict[int, List[str]] = {shard: [] for shard in range(shards)}
+    for currency in currencies:
+        node = ring.node_for(currency)
+        assignment[int(node.rsplit("-", 1)[1])].append(currency)
+    return assignment
+
+
+# ---------- Потоковый разбор ----------
+
+class BookSummaryParser:
+    """Инкрементальный разбор {"result": [{...}, ...]}: feed(кусок) -> готовые объекты"""
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._state = "envelope"  # envelope -> items -> done
+
+    def feed(self, chunk: bytes) -> List[dict]:
+        # Разобранное отбрасываем, в буфере остается только незаконченный объект
+        self._buffer = self._buffer[self._pos:] + self._text.decode(chunk)
+        self._pos = 0
+        items = []
+
+        if self._state == "envelope":
+            start = self._buffer.find('"result"')
+            bracket = self._buffer.find("[", start) if start >= 0 else -1
+            if bracket < 0:
+                return items
+            self._pos = bracket + 1
+            self._state = "items"
+
+        buffer, length = self._buffer, len(self._buffer)
+        while self._state == "items":
+            while self._pos < length and buffer[self._pos] in " \t\r\n,":
+                self._pos += 1
+            if self._pos >= length:
+                break
+            if buffer[self._pos] == "]":
+                self._state = "done"
+                break
+            try:
+                item, self._pos = self._decoder.raw_decode(buffer, self._pos)
+            except json.JSONDecodeError:
+                break  # объект пришел не целиком - ждем следующий кусок
+            items.append(item)
+        return items
+
+    def close(self):
+        if self._state == "envelope":
+            # Ответ без result - это ошибка API, показываем ее текст
+            try:
+                error = json.loads(self._buffer).get("error")
+            except ValueError:
+                error = self._buffer[:200]
+            raise Exception(f"Unexpected book summary response: {error}")
+        if self._state != "done":
+            raise Exception("Truncated book summary response")
+
+
+async def iter_book_summary(response: aiohttp.ClientResponse) -> AsyncIterator[dict]:
+    parser = BookSummaryParser()
+    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+        for item in parser.feed(chunk):
+            yield item
+    parser.close()
+
+
+# ---------- Клиент ----------
+
+class BulkClient:
+    """Один ClientSession на цикл: keep-alive соединения переиспользуются между валютами"""
+
+    def __init__(self, session: aiohttp.ClientSession, base_url: Optional[str] = None):
+        self.session = session
+        self.base_url = base_url or os.getenv("DERIBIT_BASE_URL", "https://www.deribit.com/api/v2")
+
+    async def get_book_summary(self, currency: str, timestamp: int, kind: Optional[str] = BULK_KIND,
+                               price_field: str = BULK_PRICE_FIELD) -> List[Dict[str, Any]]:
+        """Цены всех инструментов валюты в формате TickerDataCreate"""
+        url = f"{self.base_url}/public/get_book_summary_by_currency"
+        params = {"currency": currency}
+        if kind:
+            params["kind"] = kind
+
+        rows = []
+        async with self.session.get(url, params=params) as response:
+            if response.status != 200:
+                raise Exception(f"Error fetching book summary: {response.status}")
+            async for item in iter_book_summary(response):
+                price = item.get(price_field)
+                if price is None:
+                    continue
+                rows.append({
+                    "ticker": item["instrument_name"].lower(),
+                    "price": price,
+                    "timestamp": timestamp,
+                })
+        return rows
+
+
+async def fetch_book_summaries(currencies: List[str], timestamp: int,
+                               concurrency: int = BULK_CONCURRENCY) -> List[Dict[str, Any]]:
+    """Параллельно собирает сводки по валютам; ошибка одной валюты не роняет цикл.
+    timestamp - слот сбора (tasks.sample_slot), один на весь цикл, поэтому строки
+    уникальны по тикеру (при повторе инструмента побеждает последний)"""
+    timeout = aiohttp.ClientTimeout(total=BULK_TIMEOUT)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        client = BulkClient(session)
+
+        async def fetch(currency: str) -> List[Dict[str, Any]]:
+            async with semaphore:
+                try:
+                    return await client.get_book_summary(currency, timestamp)
+                except Exception as e:
+                    print(f"Error fetching {currency} book summary: {e}")
+                    return []
+
+        batches = await asyncio.gather(*(fetch(currency) for currency in dict.fromkeys(currencies)))
+    # Один тикер дважды в одном INSERT ... ON CONFLICT - ошибка "cannot affect row a second time"
+    rows = {row["ticker"]: row for batch in batches for row in batch}
+    return list(rows.values())
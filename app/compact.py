@@ -0,0 +1,292 @@
+"""
+Компактная схема хранения цен: ticker_prices + справочник tickers.
+
+Строка ticker_data хранит строку тикера, serial id, INTEGER timestamp
+(переполнится в 2038) и created_at. В ticker_prices остаются только
+integer id тикера, BIGINT timestamp в миллисекундах и цена, а вместо
+B-tree по времени - BRIN: данные пишутся строго по возрастанию времени,
+поэтому диапазонные сканы читают только нужные блоки.
+
+Переход онлайн, в три шага:
+1. migrate: триггер на ticker_data зеркалирует каждую вставку, обновление
+   и удаление в ticker_prices, после чего история переносится пачками по
+   id с короткими транзакциями. Процессы с STORAGE_LAYOUT=legacy пишут в
+   ticker_data как раньше - триггер держит копию актуальной.
+2. Все процессы (web, worker, beat) перезапускаются с STORAGE_LAYOUT=compact:
+   запись идет напрямую в ticker_prices одним INSERT на пачку, чтение - тоже
+   оттуда. Пока перезапуск не закончен, старые процессы пишут через триггер.
+3. cutover: триггер удаляется - ticker_data больше не растет, ее можно
+   выгрузить и удалить, когда она станет не нужна.
+
+Запуск:
+    python -m app.compact migrate [--batch-size 50000]
+    python -m app.compact cutover
+    python -m app.compact benchmark [--windows 20] [--window-hours 24] [--output compact.json]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from . import models
+
+STORAGE_LAYOUT = os.getenv("STORAGE_LAYOUT", "legacy")  # legacy | compact
+COMPACT_LAYOUT = STORAGE_LAYOUT == "compact"
+MIGRATION_BATCH_SIZE = int(os.getenv("COMPACT_MIGRATION_BATCH_SIZE", "50000"))
+
+COMPACT_TABLES = [models.Ticker.__table__, models.TickerPrice.__table__]
+
+# При удалении дубликата (app.dedup) исходная строка остается - тогда зеркало не трогаем.
+# id тикера сначала ищется SELECT'ом: INSERT ... ON CONFLICT тратит значение sequence
+# даже без вставки, а триггер срабатывает на каждую строку
+SYNC_FUNCTION_SQL = """
+    CREATE OR REPLACE FUNCTION ticker_data_to_compact() RETURNS trigger AS $$
+    DECLARE
+        tid integer;
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            DELETE FROM ticker_prices p
+            USING tickers t
+            WHERE t.name = OLD.ticker AND p.ticker_id = t.id
+              AND p.ts_ms = OLD.timestamp::bigint * 1000
+              AND NOT EXISTS (
+                  SELECT 1 FROM ticker_data d
+                  WHERE d.ticker = OLD.ticker AND d.timestamp = OLD.timestamp
+              );
+            RETURN OLD;
+        END IF;
+
+        SELECT id INTO tid FROM tickers WHERE name = NEW.ticker;
+        IF tid IS NULL THEN
+            INSERT INTO tickers (name) VALUES (NEW.ticker)
+            ON CONFLICT (name) DO NOTHING;
+            SELECT id INTO tid FROM tickers WHERE name = NEW.ticker;
+        END IF;
+
+        INSERT INTO ticker_prices (ts_ms, price, ticker_id)
+        VALUES (NEW.timestamp::bigint * 1000, NEW.price, tid)
+        ON CONFLICT (ticker_id, ts_ms) DO UPDATE SET price = excluded.price;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+"""
+
+DROP_SYNC_TRIGGER_SQL = """
+    DROP TRIGGER IF EXISTS ticker_data_to_compact ON ticker_data;
+    DROP FUNCTION IF EXISTS ticker_data_to_compact()
+"""
+
+SYNC_TRIGGER_SQL = """
+    DROP TRIGGER IF EXISTS ticker_data_to_compact ON ticker_data;
+    CREATE TRIGGER ticker_data_to_compact
+    AFTER INSERT OR UPDATE OR DELETE ON ticker_data
+    FOR EACH ROW EXECUTE FUNCTION ticker_data_to_compact()
+"""
+
+REGISTER_TICKERS_SQL = text("""
+    WITH RECURSIVE t AS (
+        SELECT min(ticker) AS ticker FROM ticker_data
+        UNION ALL
+        SELECT (SELECT min(ticker) FROM ticker_data WHERE ticker > t.ticker)
+        FROM t WHERE t.ticker IS NOT NULL
+    )
+    INSERT INTO tickers (name)
+    SELECT ticker FROM t
+    WHERE ticker IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM tickers WHERE name = t.ticker)
+    ORDER BY ticker
+    ON CONFLICT (name) DO NOTHING
+""")
+
+# Строки, уже записанные триггером, свежее бэкфилла - их не перезаписываем
+BACKFILL_BATCH_SQL = text("""
+    INSERT INTO ticker_prices (ts_ms, price, ticker_id)
+    SELECT d.timestamp::bigint * 1000, d.price, t.id
+    FROM ticker_data d
+    JOIN tickers t ON t.name = d.ticker
+    WHERE d.id >= :lo AND d.id < :hi
+    ORDER BY d.timestamp
+    ON CONFLICT (ticker_id, ts_ms) DO NOTHING
+""")
+
+SIZES_SQL = text("""
+    SELECT pg_table_size(CAST(:table AS regclass)) AS table_bytes,
+           pg_indexes_size(CAST(:table AS regclass)) AS index_bytes,
+           (SELECT count(*) FROM pg_index WHERE indrelid = CAST(:table AS regclass)) AS indexes
+""")
+
+LEGACY_RANGE_SQL = text("""
+    SELECT count(*), avg(price) FROM ticker_data
+    WHERE timestamp >= :start AND timestamp < :end
+""")
+
+COMPACT_RANGE_SQL = text("""
+    SELECT count(*), avg(price) FROM ticker_prices
+    WHERE ts_ms >= CAST(:start AS bigint) * 1000 AND ts_ms < CAST(:end AS bigint) * 1000
+""")
+
+LEGACY_TICKER_RANGE_SQL = text("""
+    SELECT count(*), avg(price) FROM ticker_data
+    WHERE ticker = :ticker AND timestamp >= :start AND timestamp < :end
+""")
+
+COMPACT_TICKER_RANGE_SQL = text("""
+    SELECT count(*), avg(p.price) FROM ticker_prices p
+    JOIN tickers t ON t.id = p.ticker_id
+    WHERE t.name = :ticker AND p.ts_ms >= CAST(:start AS bigint) * 1000 AND p.ts_ms < CAST(:end AS bigint) * 1000
+""")
+
+
+def migrate(db: Session, batch_size: int = MIGRATION_BATCH_SIZE) -> Dict[str, int]:
+    """Создает компактные таблицы, ставит триггер синхронизации и переносит историю"""
+    bind = db.get_bind()
+    models.Base.metadata.create_all(bind=bind, tables=COMPACT_TABLES)
+
+    # Сначала триггер: все, что придет во время переноса, попадет в ticker_prices само
+    db.execute(text(SYNC_FUNCTION_SQL))
+    db.execute(text(SYNC_TRIGGER_SQL))
+    db.execute(REGISTER_TICKERS_SQL)
+    db.commit()
+    print("✅ Compact tables and sync trigger are in place")
+
+    first_id, last_id = db.execute(text("SELECT min(id), max(id) FROM ticker_data")).one()
+    copied = 0
+    if first_id is not None:
+        lo = first_id
+        while lo <= last_id:
+            hi = lo + batch_size
+            copied += db.execute(BACKFILL_BATCH_SQL, {"lo": lo, "hi": hi}).rowcount
+            # Короткие транзакции - без долгих блокировок и раздувания WAL
+            db.commit()
+            print(f"📦 Backfilled ids < {hi}: {copied} rows")
+            lo = hi
+
+    db.execute(text("ANALYZE ticker_prices"))
+    db.commit()
+    legacy_rows = db.execute(text("SELECT count(*) FROM ticker_data")).scalar()
+    compact_rows = db.execute(text("SELECT count(*) FROM ticker_prices")).scalar()
+    print(f"✅ Migration done: {compact_rows} compact rows for {legacy_rows} legacy rows")
+    return {"copied": copied, "legacy_rows": legacy_rows, "compact_rows": compact_rows}
+
+
+def cutover(db: Session) -> Dict[str, int]:
+    """Последний шаг: снимает триггер, после чего ticker_data больше не пишется.
+    Запускать, когда все процессы уже работают с STORAGE_LAYOUT=compact"""
+    if not COMPACT_LAYOUT:
+        raise RuntimeError("Run cutover with STORAGE_LAYOUT=compact after restarting every process with it")
+    db.execute(text(DROP_SYNC_TRIGGER_SQL))
+    db.execute(text("ANALYZE ticker_prices"))
+    db.commit()
+    legacy_rows = db.execute(text("SELECT count(*) FROM ticker_data")).scalar()
+    compact_rows = db.execute(text("SELECT count(*) FROM ticker_prices")).scalar()
+    print(f"✅ Cutover done: ticker_prices is the only written table ({compact_rows} rows); "
+          f"ticker_data is frozen at {legacy_rows} rows")
+    return {"legacy_rows": legacy_rows, "compact_rows": compact_rows}
+
+
+def _sizes(db: Session, table: str, rows: int) -> dict:
+    sizes = db.execute(SIZES_SQL, {"table": table}).one()
+    return {
+        "rows": rows,
+        "table_bytes": sizes.table_bytes,
+        "index_bytes": sizes.index_bytes,
+        "indexes": sizes.indexes,
+        "bytes_per_row": round((sizes.table_bytes + sizes.index_bytes) / rows, 2) if rows else None,
+    }
+
+
+def _time_queries(db: Session, sql, params_list, repeats: int) -> dict:
+    timings = []
+    for params in params_list:
+        runs = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            db.execute(sql, params).one()
+            runs.append(time.perf_counter() - started)
+        timings.append(min(runs))
+    return {
+        "queries": len(timings),
+        "p50_ms": round(statistics.median(timings) * 1000, 3),
+        "max_ms": round(max(timings) * 1000, 3),
+    }
+
+
+def benchmark(db: Session, windows: int = 20, window_hours: float = 24, repeats: int = 3,
+              seed: Optional[int] = 42) -> dict:
+    """Размер таблиц/индексов и скорость диапазонных сканов до и после миграции"""
+    legacy_rows = db.execute(text("SELECT count(*) FROM ticker_data")).scalar()
+    compact_rows = db.execute(text("SELECT count(*) FROM ticker_prices")).scalar()
+    report = {
+        "benchmark": "compact_storage",
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "sizes": {
+            "ticker_data": _sizes(db, "ticker_data", legacy_rows),
+            "ticker_prices": _sizes(db, "ticker_prices", compact_rows),
+        },
+        "range_scans": {},
+    }
+
+    low, high = db.execute(text("SELECT min(timestamp), max(timestamp) FROM ticker_data")).one()
+    if low is None:
+        return report
+    tickers = [row[0] for row in db.execute(text("SELECT name FROM tickers ORDER BY id"))]
+
+    rng = random.Random(seed)
+    span = int(window_hours * 3600)
+    ranges = []
+    for _ in range(windows):
+        start = rng.randint(low, max(high - span, low))
+        ranges.append({"start": start, "end": start + span})
+    per_ticker = [{**r, "ticker": rng.choice(tickers)} for r in ranges] if tickers else []
+
+    report["config"] = {"windows": windows, "window_hours": window_hours, "repeats": repeats}
+    report["range_scans"]["all_tickers"] = {
+        "ticker_data": _time_queries(db, LEGACY_RANGE_SQL, ranges, repeats),
+        "ticker_prices": _time_queries(db, COMPACT_RANGE_SQL, ranges, repeats),
+    }
+    if per_ticker:
+        report["range_scans"]["one_ticker"] = {
+            "ticker_data": _time_queries(db, LEGACY_TICKER_RANGE_SQL, per_ticker, repeats),
+            "ticker_prices": _time_queries(db, COMPACT_TICKER_RANGE_SQL, per_ticker, repeats),
+        }
+    return report
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Compact ticker_prices layout: online migration and benchmark")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subparsers.add_parser("migrate", help="Создать ticker_prices и перенести историю")
+    migrate_parser.add_argument("--batch-size", type=int, default=MIGRATION_BATCH_SIZE)
+    subparsers.add_parser("cutover", help="Снять триггер: ticker_data больше не пишется")
+    bench_parser = subparsers.add_parser("benchmark", help="Сравнить размер и скорость сканов")
+    bench_parser.add_argument("--windows", type=int, default=20, help="Число случайных окон")
+    bench_parser.add_argument("--window-hours", type=float, default=24, help="Ширина окна, часы")
+    bench_parser.add_argument("--repeats", type=int, default=3, help="Повторов каждого запроса (берется лучший)")
+    bench_parser.add_argument("--output", help="Файл для JSON; по умолчанию stdout")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.command == "migrate":
+            migrate(db, batch_size=args.batch_size)
+        elif args.command == "cutover":
+            cutover(db)
+        else:
+            report = benchmark(db, windows=args.windows, window_hours=args.window_hours, repeats=args.repeats)
+            output = json.dumps(report, indent=2)
+            if args.output:
+                with open(args.output, "w") as f:
+                    f.write(output)
+            else:
+                print(output)
+    finally:
+        db.close()
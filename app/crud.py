@@ -1,8 +1,139 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from typing import List, Optional
+from sqlalchemy import desc, func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Row
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
+import numpy as np
 from . import models, schemas
+from .archive import store as archive_store
+from .compact import COMPACT_LAYOUT
+
+# Для каждой пары (тикер, ts) берем соседей слева и справа по индексу (ticker, timestamp)
+# и оставляем ближайшего; при равенстве - более позднего
+NEAREST_PRICES_SQL = text("""
+    SELECT q.ord, c.id, c.ticker, c.price, c.timestamp, c.created_at
+    FROM unnest(CAST(:tickers AS text[]), CAST(:timestamps AS bigint[]))
+        WITH ORDINALITY AS q(ticker, ts, ord)
+    LEFT JOIN LATERAL (
+        SELECT * FROM (
+            (SELECT id, ticker, price, timestamp, created_at FROM ticker_data
+             WHERE ticker = q.ticker AND timestamp <= q.ts
+             ORDER BY timestamp DESC LIMIT 1)
+            UNION ALL
+            (SELECT id, ticker, price, timestamp, created_at FROM ticker_data
+             WHERE ticker = q.ticker AND timestamp > q.ts
+             ORDER BY timestamp ASC LIMIT 1)
+        ) candidates
+        ORDER BY abs(candidates.timestamp - q.ts), candidates.timestamp DESC
+        LIMIT 1
+    ) c ON true
+    ORDER BY q.ord
+""")
+
+# Последние N записей каждого тикера: LATERAL по индексу вместо оконной функции по всей таблице
+RECENT_TICKER_DATA_SQL = text("""
+    SELECT t.id, t.ticker, t.price, t.timestamp, t.created_at
+    FROM unnest(CAST(:tickers AS text[])) AS tk(ticker)
+    CROSS JOIN LATERAL (
+        SELECT id, ticker, price, timestamp, created_at FROM ticker_data
+        WHERE ticker = tk.ticker
+        ORDER BY timestamp DESC
+        LIMIT :limit
+    ) t
+""")
+
+# ---------- Компактная схема (STORAGE_LAYOUT=compact): ticker_prices + tickers ----------
+# Строки отдаются с теми же полями, что и TickerData: суррогатного id нет,
+# created_at - время слота (цены пишутся в момент сбора)
+COMPACT_COLUMNS = """
+    NULL::bigint AS id, {ticker} AS ticker, {prices}.price,
+    {prices}.ts_ms / 1000 AS timestamp, to_timestamp({prices}.ts_ms / 1000.0) AS created_at
+"""
+
+# Регистрируем только новые имена: ON CONFLICT DO NOTHING тратит значение sequence на каждую строку
+REGISTER_TICKER_NAMES_SQL = text("""
+    INSERT INTO tickers (name)
+    SELECT n.name FROM unnest(CAST(:names AS text[])) AS n(name)
+    WHERE NOT EXISTS (SELECT 1 FROM tickers t WHERE t.name = n.name)
+    ON CONFLICT (name) DO NOTHING
+""")
+
+TICKER_IDS_SQL = text("SELECT name, id FROM tickers WHERE name = ANY(:names)")
+
+# Вся пачка - один INSERT из массивов
+UPSERT_COMPACT_PRICES_SQL = text("""
+    INSERT INTO ticker_prices (ts_ms, price, ticker_id)
+    SELECT * FROM unnest(
+        CAST(:ts_ms AS bigint[]), CAST(:prices AS double precision[]), CAST(:ticker_ids AS integer[])
+    )
+    ON CONFLICT (ticker_id, ts_ms) DO UPDATE SET price = excluded.price
+""")
+
+COMPACT_TICKER_PAGE_SQL = text(f"""
+    SELECT {COMPACT_COLUMNS.format(ticker="t.name", prices="p")}
+    FROM tickers t
+    JOIN ticker_prices p ON p.ticker_id = t.id
+    WHERE t.name = :ticker
+    ORDER BY p.ts_ms DESC
+    OFFSET :skip LIMIT :limit
+""")
+
+COMPACT_TICKER_COUNT_SQL = text("""
+    SELECT count(*) FROM ticker_prices p
+    JOIN tickers t ON t.id = p.ticker_id
+    WHERE t.name = :ticker
+""")
+
+COMPACT_RECENT_SQL = text(f"""
+    SELECT r.* FROM unnest(CAST(:tickers AS text[])) AS tk(ticker)
+    JOIN tickers t ON t.name = tk.ticker
+    CROSS JOIN LATERAL (
+        SELECT {COMPACT_COLUMNS.format(ticker="t.name", prices="p")}
+        FROM ticker_prices p
+        WHERE p.ticker_id = t.id
+        ORDER BY p.ts_ms DESC
+        LIMIT :limit
+    ) r
+""")
+
+COMPACT_NEAREST_PRICES_SQL = text(f"""
+    SELECT q.ord, c.* FROM unnest(CAST(:tickers AS text[]), CAST(:timestamps AS bigint[]))
+        WITH ORDINALITY AS q(ticker, ts, ord)
+    LEFT JOIN tickers t ON t.name = q.ticker
+    LEFT JOIN LATERAL (
+        SELECT {COMPACT_COLUMNS.format(ticker="q.ticker", prices="candidates")} FROM (
+            (SELECT price, ts_ms FROM ticker_prices
+             WHERE ticker_id = t.id AND ts_ms <= q.ts * 1000
+             ORDER BY ts_ms DESC LIMIT 1)
+            UNION ALL
+            (SELECT price, ts_ms FROM ticker_prices
+             WHERE ticker_id = t.id AND ts_ms > q.ts * 1000
+             ORDER BY ts_ms ASC LIMIT 1)
+        ) candidates
+        ORDER BY abs(candidates.ts_ms - q.ts * 1000), candidates.ts_ms DESC
+        LIMIT 1
+    ) c ON true
+    ORDER BY q.ord
+""")
+
+# id тикеров не меняются - кэшируем на весь процесс
+_ticker_ids: Dict[str, int] = {}
+
+# Одна строка (id = 1); создается при первом изменении правил
+BUMP_ALERT_RULES_VERSION_SQL = text("""
+    INSERT INTO alert_rules_version (id, version) VALUES (1, 1)
+    ON CONFLICT (id) DO UPDATE SET version = alert_rules_version.version + 1
+""")
+
+MARK_ALERTS_TRIGGERED_SQL = text("""
+    UPDATE alert_rules SET last_triggered_ts = :ts
+    WHERE id = ANY(:ids) AND active
+      AND (kind <> 'move_pct'
+           OR last_triggered_ts IS NULL
+           OR last_triggered_ts <= :ts - window_minutes * 60)
+    RETURNING id
+""")
 
 def create_ticker_data(db: Session, ticker_data: schemas.TickerDataCreate):
     db_ticker_data = models.TickerData(
@@ -15,38 +146,229 @@ def create_ticker_data(db: Session, ticker_data: schemas.TickerDataCreate):
     db.refresh(db_ticker_data)
     return db_ticker_data
 
+def upsert_ticker_data(db: Session, items: List[schemas.TickerDataCreate]) -> int:
+    """Пакетная идемпотентная запись: INSERT ... ON CONFLICT (ticker, timestamp);
+    при STORAGE_LAYOUT=compact - напрямую в ticker_prices"""
+    if not items:
+        return 0
+    
+    # Повтор ключа в одной пачке Postgres не принимает ("cannot affect row a second time"),
+    # поэтому оставляем последнюю цену для каждой пары (ticker, timestamp)
+    rows = {
+        (item.ticker, item.timestamp): {"ticker": item.ticker, "price": item.price, "timestamp": item.timestamp}
+        for item in items
+    }
+    if COMPACT_LAYOUT:
+        return _upsert_compact(db, list(rows.values()))
+    
+    stmt = insert(models.TickerData)
+    # Повторный запуск задачи перезаписывает цену, а не плодит дубликаты
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.TickerData.ticker, models.TickerData.timestamp],
+        set_={"price": stmt.excluded.price}
+    )
+    # executemany: SQLAlchemy склеивает строки в многострочные VALUES пачками,
+    # а скомпилированный запрос кэшируется - тысячи инструментов за цикл не проблема
+    db.execute(stmt, list(rows.values()))
+    db.commit()
+    # Каждая строка либо вставлена, либо обновлена
+    return len(rows)
+
+def ticker_ids(db: Session, names: List[str]) -> Dict[str, int]:
+    """id тикеров справочника; новые имена регистрируются"""
+    missing = [name for name in set(names) if name not in _ticker_ids]
+    if missing:
+        db.execute(REGISTER_TICKER_NAMES_SQL, {"names": missing})
+        # Фиксируем сразу: после отката пачки в кэше остались бы id несуществующих тикеров
+        db.commit()
+        _ticker_ids.update(db.execute(TICKER_IDS_SQL, {"names": missing}).all())
+    return {name: _ticker_ids[name] for name in names}
+
+def _upsert_compact(db: Session, rows: List[dict]) -> int:
+    """Запись пачки напрямую в ticker_prices, минуя ticker_data"""
+    ids = ticker_ids(db, [row["ticker"] for row in rows])
+    db.execute(UPSERT_COMPACT_PRICES_SQL, {
+        "ts_ms": [row["timestamp"] * 1000 for row in rows],
+        "prices": [row["price"] for row in rows],
+        "ticker_ids": [ids[row["ticker"]] for row in rows],
+    })
+    db.commit()
+    return len(rows)
+
 def get_ticker_data(db: Session, ticker: str, skip: int = 0, limit: int = 100) -> List[models.TickerData]:
-    return db.query(models.TickerData)\
-        .filter(models.TickerData.ticker == ticker)\
-        .order_by(desc(models.TickerData.timestamp))\
-        .offset(skip)\
-        .limit(limit)\
-        .all()
+    if COMPACT_LAYOUT:
+        rows = db.execute(COMPACT_TICKER_PAGE_SQL, {"ticker": ticker, "skip": skip, "limit": limit}).all()
+    else:
+        rows = db.query(models.TickerData)\
+            .filter(models.TickerData.ticker == ticker)\
+            .order_by(desc(models.TickerData.timestamp))\
+            .offset(skip)\
+            .limit(limit)\
+            .all()
+    
+    # Строки в БД закончились - дочитываем более старые из архива
+    if len(rows) < limit and archive_store.count(ticker):
+        if rows:
+            db_total = skip + len(rows)
+        elif COMPACT_LAYOUT:
+            db_total = db.execute(COMPACT_TICKER_COUNT_SQL, {"ticker": ticker}).scalar()
+        else:
+            db_total = db.query(func.count(models.TickerData.id))\
+                .filter(models.TickerData.ticker == ticker)\
+                .scalar()
+        rows = rows + archive_store.read_desc(ticker, skip=max(skip - db_total, 0), limit=limit - len(rows))
+    return rows
 
 def get_latest_price(db: Session, ticker: str) -> Optional[models.TickerData]:
+    if COMPACT_LAYOUT:
+        return db.execute(COMPACT_TICKER_PAGE_SQL, {"ticker": ticker, "skip": 0, "limit": 1}).first()
     return db.query(models.TickerData)\
         .filter(models.TickerData.ticker == ticker)\
         .order_by(desc(models.TickerData.timestamp))\
         .first()
 
-def get_price_by_date(db: Session, ticker: str, date: datetime) -> Optional[models.TickerData]:
-    # Преобразуем дату в UNIX timestamp
-    target_timestamp = int(date.timestamp())
+def get_recent_ticker_data(db: Session, tickers: List[str], limit: int) -> Dict[str, List[models.TickerData]]:
+    """Последние limit записей для каждого тикера одним запросом (от новых к старым)"""
+    if COMPACT_LAYOUT:
+        rows = db.execute(COMPACT_RECENT_SQL, {"tickers": tickers, "limit": limit}).all()
+    else:
+        rows = db.execute(
+            select(models.TickerData).from_statement(RECENT_TICKER_DATA_SQL),
+            {"tickers": tickers, "limit": limit}
+        ).scalars().all()
     
-    # Находим ближайшую запись по времени
-    result = db.query(models.TickerData)\
-        .filter(models.TickerData.ticker == ticker)\
-        .order_by(desc(models.TickerData.timestamp))\
-        .all()
+    result = {ticker: [] for ticker in tickers}
+    for row in rows:
+        result[row.ticker].append(row)
+    return result
+
+def get_price_series(db: Session, ticker: str, start: int, end: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Ряд (timestamp, price) тикера за [start, end] по возрастанию, включая архив"""
+    if COMPACT_LAYOUT:
+        rows = _compact_range(db, ticker, start, end)
+    else:
+        # Только две колонки, без гидратации ORM-объектов
+        rows = db.query(models.TickerData.timestamp, models.TickerData.price)\
+            .filter(models.TickerData.ticker == ticker)\
+            .filter(models.TickerData.timestamp >= start)\
+            .filter(models.TickerData.timestamp <= end)\
+            .order_by(models.TickerData.timestamp)\
+            .all()
+    timestamps = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    prices = np.fromiter((row[1] for row in rows), dtype=float, count=len(rows))
     
-    # Ищем самую близкую запись по времени
-    closest_record = None
-    min_diff = float('inf')
+    archived_ts, archived_prices = archive_store.read_range(ticker, start, end)
+    if len(archived_ts):
+        # Архив всегда старше данных в БД, но на стыке возможны совпадения
+        keep = archived_ts < timestamps[0] if len(timestamps) else slice(None)
+        timestamps = np.concatenate((archived_ts[keep], timestamps))
+        prices = np.concatenate((archived_prices[keep], prices))
+    return timestamps, prices
+
+def _compact_range(db: Session, ticker: str, start: int, end: int) -> List[Row]:
+    """(timestamp в секундах, price) из ticker_prices; фильтр по ts_ms, чтобы работали индексы"""
+    return db.query(models.TickerPrice.ts_ms // 1000, models.TickerPrice.price)\
+        .join(models.Ticker, models.Ticker.id == models.TickerPrice.ticker_id)\
+        .filter(models.Ticker.name == ticker)\
+        .filter(models.TickerPrice.ts_ms >= start * 1000)\
+        .filter(models.TickerPrice.ts_ms < (end + 1) * 1000)\
+        .order_by(models.TickerPrice.ts_ms)\
+        .all()
+
+def get_prices_by_dates(db: Session, lookups: List[Tuple[str, datetime]]) -> List[Optional[Row]]:
+    """Ближайшие по времени записи для набора (тикер, дата) одним запросом, в порядке входа"""
+    if not lookups:
+        return []
     
-    for record in result:
-        diff = abs(record.timestamp - target_timestamp)
-        if diff < min_diff:
-            min_diff = diff
-            closest_record = record
+    tickers = [ticker for ticker, _ in lookups]
+    # Преобразуем даты в UNIX timestamp
+    timestamps = [int(date.timestamp()) for _, date in lookups]
     
-    return closest_record
\ No newline at end of file
+    sql = COMPACT_NEAREST_PRICES_SQL if COMPACT_LAYOUT else NEAREST_PRICES_SQL
+    rows = db.execute(sql, {"tickers": tickers, "timestamps": timestamps}).all()
+    return [
+        _nearest_with_archive(ticker, target, row if row.timestamp is not None else None)
+        for ticker, target, row in zip(tickers, timestamps, rows)
+    ]
+
+def _nearest_with_archive(ticker: str, target: int, row: Optional[Row]):
+    """Сравнивает найденную в БД запись с ближайшей архивной"""
+    distance = archive_store.distance(ticker, target)
+    # Архива нет или запись из БД заведомо ближе - в файлы не лезем
+    if distance is None or (row is not None and abs(row.timestamp - target) < distance):
+        return row
+    archived = archive_store.nearest(ticker, target)
+    if archived is None:
+        return row
+    if row is None:
+        return archived
+    # При равенстве - более поздняя запись, как и в SQL
+    if (abs(archived.timestamp - target), -archived.timestamp) < (abs(row.timestamp - target), -row.timestamp):
+        return archived
+    return row
+
+def get_price_by_date(db: Session, ticker: str, date: datetime) -> Optional[Row]:
+    return get_prices_by_dates(db, [(ticker, date)])[0]
+
+
+def get_price_range(db: Session, ticker: str, since: int) -> Tuple[Optional[float], Optional[float]]:
+    """Минимальная и максимальная цена тикера начиная с since (UNIX timestamp)"""
+    if COMPACT_LAYOUT:
+        return db.query(func.min(models.TickerPrice.price), func.max(models.TickerPrice.price))\
+            .join(models.Ticker, models.Ticker.id == models.TickerPrice.ticker_id)\
+            .filter(models.Ticker.name == ticker)\
+            .filter(models.TickerPrice.ts_ms >= since * 1000)\
+            .one()
+    return db.query(func.min(models.TickerData.price), func.max(models.TickerData.price))\
+        .filter(models.TickerData.ticker == ticker)\
+        .filter(models.TickerData.timestamp >= since)\
+        .one()
+
+def create_alert_rule(db: Session, rule: schemas.AlertRuleCreate) -> models.AlertRule:
+    db_rule = models.AlertRule(**rule.model_dump())
+    db.add(db_rule)
+    # В той же транзакции - воркер не увидит новую версию без нового правила
+    db.execute(BUMP_ALERT_RULES_VERSION_SQL)
+    db.commit()
+    db.refresh(db_rule)
+    return db_rule
+
+def get_alert_rules(db: Session, active_only: bool = False) -> List[models.AlertRule]:
+    query = db.query(models.AlertRule)
+    if active_only:
+        query = query.filter(models.AlertRule.active.is_(True))
+    return query.order_by(models.AlertRule.id).all()
+
+def deactivate_alert_rule(db: Session, rule_id: int) -> Optional[models.AlertRule]:
+    db_rule = db.query(models.AlertRule).filter(models.AlertRule.id == rule_id).first()
+    if db_rule is None:
+        return None
+    db_rule.active = False
+    db_rule.updated_at = func.now()
+    db.execute(BUMP_ALERT_RULES_VERSION_SQL)
+    db.commit()
+    db.refresh(db_rule)
+    return db_rule
+
+def get_alert_rules_version(db: Session) -> Optional[int]:
+    """Версия набора правил: одна строка по первичному ключу, растет при создании и отключении"""
+    return db.query(models.AlertRulesVersion.version).filter(models.AlertRulesVersion.id == 1).scalar()
+
+def mark_alert_rules_triggered(db: Session, rule_ids: List[int], timestamp: int) -> List[int]:
+    """Отмечает срабатывание; move_pct-правила повторно срабатывают не раньше конца окна"""
+    result = db.execute(MARK_ALERTS_TRIGGERED_SQL, {"ids": rule_ids, "ts": timestamp})
+    fired = [row.id for row in result]
+    db.commit()
+    return fired
+
+def get_quality_issues(db: Session, ticker: Optional[str] = None, kind: Optional[str] = None,
+                       skip: int = 0, limit: int = 100) -> List[models.DataQualityIssue]:
+    query = db.query(models.DataQualityIssue)
+    if ticker:
+        query = query.filter(models.DataQualityIssue.ticker == ticker)
+    if kind:
+        query = query.filter(models.DataQualityIssue.kind == kind)
+    return query.order_by(desc(models.DataQualityIssue.timestamp))\
+        .offset(skip)\
+        .limit(limit)\
+        .all()
\ No newline at end of file
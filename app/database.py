@@ -1,7 +1,9 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+import itertools
 import os
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -12,28 +14,197 @@ DB_NAME = os.getenv("DB_NAME", "deribit_db")
 DB_USER = os.getenv("DB_USER", "postgres")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "postgres")
 
+# Реплики для чтения: "replica1:5432,replica2:5432". Пусто - все читается с primary
+DB_REPLICA_HOSTS = os.getenv("DB_REPLICA_HOSTS", "")
+# Максимально допустимое отставание реплики в секундах. 0 - проверка отключена
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "0"))
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "5"))
+
+# Пул соединений
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# create - create_all при старте (как раньше); check - только сверка версии схемы, без DDL
+DB_STARTUP_MODE = os.getenv("DB_STARTUP_MODE", "create")
+
+# Увеличивать при каждом изменении моделей
+SCHEMA_VERSION = 3
+
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-engine = create_engine(DATABASE_URL)
+# Primary: все записи (Celery) и fallback для чтения
+engine = create_engine(
+    DATABASE_URL,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=True
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# now() - pg_last_xact_replay_timestamp() - возраст последней проигранной транзакции,
+# а не отставание: primary пишет раз в FETCH_INTERVAL, и догнавшая реплика "отставала" бы
+# до минуты. Поэтому если все полученное WAL уже проиграно, отставание 0, а разница
+# времени считается только пока проигрывание действительно позади
+REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+""")
+
+
+class ReplicaRouter:
+    """Распределяет чтение по здоровым репликам (round-robin) с откатом на primary"""
+    
+    def __init__(self, replica_urls, max_lag: float = 0, check_interval: float = 5):
+        self.engines = [
+            create_engine(
+                url,
+                pool_size=DB_POOL_SIZE,
+                max_overflow=DB_MAX_OVERFLOW,
+                pool_recycle=DB_POOL_RECYCLE,
+                pool_pre_ping=True,
+                connect_args={"connect_timeout": 2}
+            )
+            for url in replica_urls
+        ]
+        self._sessionmakers = [
+            sessionmaker(autocommit=False, autoflush=False, bind=e) for e in self.engines
+        ]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        # До первой проверки читаем с primary - недоступная реплика не должна тормозить запросы
+        self._healthy = []
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+        self._monitor_pid = None
+        self._stop = threading.Event()
+    
+    def _is_healthy(self, replica_engine) -> bool:
+        try:
+            with replica_engine.connect() as conn:
+                lag = conn.execute(REPLICA_LAG_SQL).scalar()
+        except Exception as e:
+            print(f"⚠️  Replica {replica_engine.url.host} is unavailable: {e}")
+            return False
+        # lag = NULL - реплика еще ничего не проиграла
+        if self.max_lag > 0 and (lag is None or lag > self.max_lag):
+            print(f"⚠️  Replica {replica_engine.url.host} lag {lag}s exceeds {self.max_lag}s")
+            return False
+        return True
+    
+    def check_health(self):
+        """Обновляет список здоровых реплик"""
+        self._healthy = [i for i, e in enumerate(self.engines) if self._is_healthy(e)]
+    
+    def _monitor(self):
+        while not self._stop.is_set():
+            try:
+                self.check_health()
+            except Exception as e:
+                print(f"⚠️  Replica health check failed: {e}")
+            self._stop.wait(self.check_interval)
+    
+    def start(self):
+        """Запускает фоновую проверку реплик (раз в check_interval); повторный вызов ничего не делает"""
+        # После fork поток родителя не существует - запускаем свой в каждом процессе
+        if not self.engines or self._monitor_pid == os.getpid():
+            return
+        with self._lock:
+            if self._monitor_pid == os.getpid():
+                return
+            self._stop.clear()
+            threading.Thread(target=self._monitor, name="replica-health", daemon=True).start()
+            self._monitor_pid = os.getpid()
+    
+    def stop(self):
+        self._stop.set()
+        self._monitor_pid = None
+    
+    def session(self):
+        """Сессия на следующей здоровой реплике или на primary, если таких нет"""
+        if not self.engines:
+            return SessionLocal()
+        # Проверка здоровья идет в фоне - поток запроса только читает готовый список
+        self.start()
+        healthy = self._healthy
+        if not healthy:
+            return SessionLocal()
+        index = healthy[next(self._counter) % len(healthy)]
+        return self._sessionmakers[index]()
+
+
+def _replica_urls():
+    urls = []
+    for host_port in filter(None, (h.strip() for h in DB_REPLICA_HOSTS.split(","))):
+        host, _, port = host_port.partition(":")
+        urls.append(f"postgresql://{DB_USER}:{DB_PASSWORD}@{host}:{port or DB_PORT}/{DB_NAME}")
+    return urls
+
+
+read_router = ReplicaRouter(
+    _replica_urls(),
+    max_lag=DB_REPLICA_MAX_LAG,
+    check_interval=DB_REPLICA_CHECK_INTERVAL
+)
+
 Base = declarative_base()
 
-def init_db():
-    """Инициализирует базу данных, создает таблицы если их нет"""
+def init_db(mode: str = None):
+    """Инициализирует базу данных: создает таблицы (create) или только сверяет версию схемы (check)"""
+    mode = mode or DB_STARTUP_MODE
     try:
         # Импортируем модели чтобы они были зарегистрированы в Base.metadata
         from app import models
         
+        if mode == "check":
+            # Один SELECT вместо рефлексии всех таблиц
+            with engine.connect() as conn:
+                version = conn.execute(text("SELECT version FROM schema_version WHERE id = 1")).scalar()
+            if version != SCHEMA_VERSION:
+                raise RuntimeError(
+                    f"Schema version {version}, expected {SCHEMA_VERSION}. Run once with DB_STARTUP_MODE=create"
+                )
+            print(f"✅ Database schema version {version} verified")
+            return
+        
         # Создаем все таблицы
         Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            conn.execute(text("""
+                INSERT INTO schema_version (id, version) VALUES (1, :version)
+                ON CONFLICT (id) DO UPDATE SET version = excluded.version, applied_at = now()
+            """), {"version": SCHEMA_VERSION})
         print("✅ Database tables created/verified")
     except Exception as e:
         print(f"⚠️  Error creating tables: {e}")
         raise
 
+def warm_pool(target_engine, size: int):
+    """Заранее открывает size соединений пула (с pre-ping), чтобы первые запросы их не ждали"""
+    connections = []
+    try:
+        for _ in range(size):
+            connections.append(target_engine.connect())
+    finally:
+        # Возвращаем в пул - соединения остаются открытыми
+        for conn in connections:
+            conn.close()
+    return len(connections)
+
 def get_db():
     db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_read_db():
+    """Сессия только для чтения: реплика, если доступна, иначе primary"""
+    db = read_router.session()
     try:
         yield db
     finally:
@@ -0,0 +1,102 @@
+"""
+Одноразовая онлайн-дедупликация таблицы ticker_data.
+
+Удаляет дубликаты (ticker, timestamp) небольшими пачками по диапазонам id,
+каждая пачка - отдельная короткая транзакция, поэтому таблица не блокируется
+надолго и сбор цен продолжает работать. После чистки уникальный индекс
+строится через CREATE INDEX CONCURRENTLY.
+
+Запуск:
+    python -m app.dedup --batch-size 50000
+"""
+import argparse
+import time
+from sqlalchemy import text
+from .database import engine
+
+UNIQUE_INDEX = "uq_ticker_data_ticker_timestamp"
+HELPER_INDEX = "ix_ticker_data_dedup_tmp"
+
+DELETE_BATCH_SQL = text("""
+    DELETE FROM ticker_data t
+    USING ticker_data d
+    WHERE t.id >= :lo AND t.id < :hi
+      AND d.ticker = t.ticker
+      AND d.timestamp = t.timestamp
+      AND d.id < t.id
+""")
+
+
+def _autocommit_conn():
+    # CREATE/DROP INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    return engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+
+
+def _delete_duplicates(start_id: int, batch_size: int, pause: float) -> int:
+    """Удаляет дубликаты начиная с start_id, оставляя запись с минимальным id"""
+    with engine.connect() as conn:
+        max_id = conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM ticker_data")).scalar()
+
+    deleted = 0
+    lo = start_id
+    while lo <= max_id:
+        hi = lo + batch_size
+        with engine.begin() as conn:
+            count = conn.execute(DELETE_BATCH_SQL, {"lo": lo, "hi": hi}).rowcount
+        deleted += count
+        print(f"🧹 ids [{lo}, {hi}): removed {count} duplicates")
+        lo = hi
+        if pause:
+            time.sleep(pause)
+    return deleted
+
+
+def deduplicate(batch_size: int = 50000, pause: float = 0.1, max_attempts: int = 3) -> int:
+    """Чистит дубликаты и создает уникальный индекс (ticker, timestamp)"""
+    with _autocommit_conn() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM pg_indexes WHERE tablename = 'ticker_data' AND indexname = :name"),
+            {"name": UNIQUE_INDEX}
+        ).scalar()
+        if exists:
+            print(f"✅ Index {UNIQUE_INDEX} already exists, nothing to do")
+            return 0
+        # Вспомогательный неуникальный индекс, чтобы поиск дублей в каждой пачке был дешевым
+        conn.execute(text(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {HELPER_INDEX} ON ticker_data (ticker, timestamp, id)"
+        ))
+
+    total = 0
+    start_id = 0
+    try:
+        for attempt in range(1, max_attempts + 1):
+            with engine.connect() as conn:
+                next_start = conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM ticker_data")).scalar()
+            total += _delete_duplicates(start_id, batch_size, pause)
+
+            try:
+                with _autocommit_conn() as conn:
+                    conn.execute(text(
+                        f"CREATE UNIQUE INDEX CONCURRENTLY {UNIQUE_INDEX} ON ticker_data (ticker, timestamp)"
+                    ))
+                print(f"✅ Created {UNIQUE_INDEX}, removed {total} duplicates")
+                return total
+            except Exception as e:
+                # Пока шла чистка, старый код мог вставить новые дубли - индекс остается INVALID
+                print(f"⚠️  Attempt {attempt}: unique index build failed: {e}")
+                with _autocommit_conn() as conn:
+                    conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {UNIQUE_INDEX}"))
+                # Повторно проходим только хвост, появившийся после начала попытки
+                start_id = next_start - batch_size if next_start > batch_size else 0
+        raise RuntimeError(f"Could not build {UNIQUE_INDEX} after {max_attempts} attempts")
+    finally:
+        with _autocommit_conn() as conn:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {HELPER_INDEX}"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batched online deduplication of ticker_data")
+    parser.add_argument("--batch-size", type=int, default=50000)
+    parser.add_argument("--pause", type=float, default=0.1, help="Пауза между пачками, сек")
+    args = parser.parse_args()
+    deduplicate(batch_size=args.batch_size, pause=args.pause)
@@ -0,0 +1,253 @@
+"""
+Адаптивное ограничение параллельных запросов к БД и сброс нагрузки.
+
+Лимит одновременно выполняемых запросов подбирается по AIMD: пока задержка
+маршрута близка к его базовой (минимальной) задержке и лимит используется,
+он растет на 1/limit за ответ; когда задержка превышает базовую в
+LIMITER_TOLERANCE раз при занятом лимите (не меньше LIMITER_BACKOFF_LOAD
+его доли), лимит умножается на LIMITER_BACKOFF (не чаще раза на "поколение"
+запросов - как окно TCP). Медленный ответ при свободном лимите - свойство
+самого запроса, а не перегрузка. Ответы low-маршрутов в оценку не идут:
+их задержка зависит от объема выгрузки (глубина истории, размер батча).
+
+Маршруты разделены на классы приоритета, каждый может занять только свою
+долю лимита: high (latest, price, bootstrap) - весь лимит, normal - 80%,
+low (история, батчи, кросс-ряды, скан качества) - 50%. Поэтому тяжелые
+выгрузки не вытесняют горячие эндпоинты. high и normal при нехватке мест
+ждут в очереди по приоритету (не дольше LIMITER_QUEUE_TIMEOUT). low сбрасывается
+только при реальной перегрузке - лимит снижался за последние
+LIMITER_OVERLOAD_WINDOW секунд или последний ответ high/normal медленнее
+базового: тогда сверх своей доли текущего лимита он сразу получает 503 с
+Retry-After. Без перегрузки low ограничен своей долей LIMITER_MAX (его ответы
+лимит не двигают, так что доля текущего лимита держала бы его на минимуме).
+/health, статика и /api/stats/* не ограничиваются.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from fastapi.responses import JSONResponse
+
+from .database import DB_MAX_OVERFLOW, DB_POOL_SIZE
+
+LIMITER_ENABLED = os.getenv("LIMITER_ENABLED", "1") == "1"
+# Выше размера пула смысла нет: лишние запросы все равно ждут соединение
+LIMITER_MAX = int(os.getenv("LIMITER_MAX", str(DB_POOL_SIZE + DB_MAX_OVERFLOW)))
+LIMITER_MIN = int(os.getenv("LIMITER_MIN", "2"))
+LIMITER_INITIAL = int(os.getenv("LIMITER_INITIAL", str(DB_POOL_SIZE)))
+LIMITER_TOLERANCE = float(os.getenv("LIMITER_TOLERANCE", "2.0"))
+LIMITER_BACKOFF = float(os.getenv("LIMITER_BACKOFF", "0.9"))
+LIMITER_BACKOFF_LOAD = float(os.getenv("LIMITER_BACKOFF_LOAD", "0.8"))  # доля лимита
+LIMITER_QUEUE_SIZE = int(os.getenv("LIMITER_QUEUE_SIZE", "100"))
+LIMITER_QUEUE_TIMEOUT = float(os.getenv("LIMITER_QUEUE_TIMEOUT", "2.0"))  # сек
+LIMITER_RETRY_AFTER = int(os.getenv("LIMITER_RETRY_AFTER", "1"))  # сек
+LIMITER_OVERLOAD_WINDOW = float(os.getenv("LIMITER_OVERLOAD_WINDOW", "5"))  # сек после снижения лимита
+
+# Базовая задержка маршрута медленно подтягивается к текущей,
+# чтобы рост таблиц не считался перегрузкой навсегда
+BASELINE_DRIFT = 0.01
+
+HIGH, NORMAL, LOW = 0, 1, 2
+PRIORITY_NAMES = {HIGH: "high", NORMAL: "normal", LOW: "low"}
+# Доля лимита, доступная классу
+PRIORITY_SHARES = {HIGH: 1.0, NORMAL: 0.8, LOW: 0.5}
+
+ROUTE_PRIORITIES = {
+    "/api/ticker/latest": HIGH,
+    "/api/ticker/price": HIGH,
+    "/api/dashboard/bootstrap": HIGH,
+    "/api/ticker/data": LOW,
+    "/api/ticker/cross": LOW,
+    "/api/ticker/price/batch": LOW,
+    "/api/quality/scan": LOW,
+    "/api/quality/issues": LOW,
+}
+UNLIMITED_PREFIXES = ("/api/stats/",)
+
+
+def route_priority(path: str) -> Optional[int]:
+    """Класс приоритета маршрута; None - маршрут не ограничивается"""
+    if not path.startswith("/api/") or path.startswith(UNLIMITED_PREFIXES):
+        return None
+    return ROUTE_PRIORITIES.get(path, NORMAL)
+
+
+class AdaptiveLimiter:
+    """AIMD-лимит параллельности с очередью по приоритету. Работает в одном event loop"""
+
+    def __init__(self, initial: int = LIMITER_INITIAL, min_limit: int = LIMITER_MIN,
+                 max_limit: int = LIMITER_MAX, tolerance: float = LIMITER_TOLERANCE,
+                 backoff: float = LIMITER_BACKOFF, backoff_load: float = LIMITER_BACKOFF_LOAD,
+                 queue_size: int = LIMITER_QUEUE_SIZE, queue_timeout: float = LIMITER_QUEUE_TIMEOUT,
+                 overload_window: float = LIMITER_OVERLOAD_WINDOW):
+        self.min_limit = min_limit
+        self.max_limit = max(max_limit, min_limit)
+        self.limit = float(min(max(initial, min_limit), self.max_limit))
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.backoff_load = backoff_load
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.overload_window = overload_window
+        self.inflight = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._baselines: Dict[str, float] = {}
+        self._last_decrease = 0.0
+        # Последний ответ high/normal был медленнее базового
+        self._congested = False
+        self._stats = {
+            name: {"admitted": 0, "queued": 0, "rejected": 0, "timed_out": 0}
+            for name in PRIORITY_NAMES.values()
+        }
+
+    def overloaded(self) -> bool:
+        recent_backoff = self._last_decrease > 0 and time.perf_counter() - self._last_decrease < self.overload_window
+        return self._congested or recent_backoff
+
+    def capacity(self, priority: int) -> int:
+        limit = self.limit
+        if priority == LOW and not self.overloaded():
+            limit = self.max_limit
+        return max(int(limit * PRIORITY_SHARES[priority]), 1)
+
+    def _has_waiters(self, priority: int) -> bool:
+        # Ожидающие того же или более высокого приоритета проходят первыми
+        return any(not future.done() and p <= priority for p, _, future in self._waiters)
+
+    async def acquire(self, priority: int) -> bool:
+        """True - запрос допущен (после него обязательно release), False - сбросить"""
+        stats = self._stats[PRIORITY_NAMES[priority]]
+        if self.inflight < self.capacity(priority) and not self._has_waiters(priority):
+            self.inflight += 1
+            stats["admitted"] += 1
+            return True
+        # Низкий приоритет не ждет: быстрый 503 дешевле места в очереди
+        if priority == LOW or len(self._waiters) >= self.queue_size:
+            stats["rejected"] += 1
+            return False
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        stats["queued"] += 1
+        try:
+            # Место резервирует _dispatch (inflight уже увеличен)
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                # Место выдали в момент таймаута - используем его
+                stats["admitted"] += 1
+                return True
+            self._forget(future)
+            stats["timed_out"] += 1
+            return False
+        except asyncio.CancelledError:
+            # Клиент ушел из очереди: выданное место возвращаем, иначе оно утечет
+            if future.done() and not future.cancelled():
+                self.inflight -= 1
+                self._dispatch()
+            else:
+                self._forget(future)
+            raise
+        stats["admitted"] += 1
+        return True
+
+    def _forget(self, future: asyncio.Future):
+        future.cancel()
+        self._waiters = [w for w in self._waiters if w[2] is not future]
+        heapq.heapify(self._waiters)
+
+    def release(self, route: str, priority: int, started: float, latency: Optional[float]):
+        """Освобождает место; latency=None - ответ неудачный, в оценку не идет"""
+        self.inflight -= 1
+        if latency is not None and priority != LOW:
+            self._update(route, started, latency)
+        self._dispatch()
+
+    def _update(self, route: str, started: float, latency: float):
+        # Сколько запросов выполнялось вместе с этим (включая его самого)
+        load = self.inflight + 1
+        baseline = self._baselines.get(route)
+        if baseline is None or latency < baseline:
+            self._baselines[route] = latency
+            baseline = latency
+        else:
+            self._baselines[route] = baseline + (latency - baseline) * BASELINE_DRIFT
+
+        self._congested = latency > baseline * self.tolerance
+        if self._congested:
+            # Снижаем, только если лимит действительно занят; запросы, начатые
+            # до прошлого снижения, его уже "видели" - не снижаем повторно
+            if load >= self.limit * self.backoff_load and started >= self._last_decrease:
+                self.limit = max(self.limit * self.backoff, self.min_limit)
+                self._last_decrease = time.perf_counter()
+        elif load >= self.limit / 2:
+            # Рост только при реальной загрузке лимита
+            self.limit = min(self.limit + 1 / self.limit, self.max_limit)
+
+    def _dispatch(self):
+        while self._waiters:
+            priority, _, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if self.inflight >= self.capacity(priority):
+                break
+            heapq.heappop(self._waiters)
+            self.inflight += 1
+            future.set_result(True)
+
+    def stats(self) -> dict:
+        return {
+            "limit": round(self.limit, 2),
+            "inflight": self.inflight,
+            "waiting": sum(1 for _, _, future in self._waiters if not future.done()),
+            "overloaded": self.overloaded(),
+            "capacity": {name: self.capacity(p) for p, name in PRIORITY_NAMES.items()},
+            "classes": {name: dict(values) for name, values in self._stats.items()},
+        }
+
+
+limiter = AdaptiveLimiter()
+
+
+class ConcurrencyLimitMiddleware:
+    """ASGI middleware: допуск по классу приоритета, замер задержки до конца ответа"""
+
+    def __init__(self, app, limiter: AdaptiveLimiter = limiter, retry_after: int = LIMITER_RETRY_AFTER):
+        self.app = app
+        self.limiter = limiter
+        self.retry_after = retry_after
+
+    async def __call__(self, scope, receive, send):
+        priority = route_priority(scope["path"]) if scope["type"] == "http" else None
+        if priority is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await self.limiter.acquire(priority):
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Server is overloaded, retry later"},
+                headers={"Retry-After": str(self.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Ошибки 5xx часто быстрые (нет соединения) - не дают ложный сигнал "все хорошо"
+            latency = time.perf_counter() - started if status["code"] < 500 else None
+            self.limiter.release(scope["path"], priority, started, latency)
@@ -1,9 +1,13 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, Boolean, ForeignKey, Index, PrimaryKeyConstraint, UniqueConstraint
 from sqlalchemy.sql import func
 from .database import Base
 
 class TickerData(Base):
     __tablename__ = "ticker_data"
+    __table_args__ = (
+        # Одна запись на (тикер, момент времени) - основа идемпотентной записи
+        Index("uq_ticker_data_ticker_timestamp", "ticker", "timestamp", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     ticker = Column(String, index=True, nullable=False)
@@ -12,4 +16,96 @@ class TickerData(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     def __repr__(self):
-        return f"<TickerData(ticker={self.ticker}, price={self.price}, timestamp={self.timestamp})>"
\ No newline at end of file
+        return f"<TickerData(ticker={self.ticker}, price={self.price}, timestamp={self.timestamp})>"
+
+
+class AlertRule(Base):
+    __tablename__ = "alert_rules"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    ticker = Column(String, nullable=False)
+    kind = Column(String, nullable=False)  # cross_above, cross_below, move_pct
+    threshold = Column(Float, nullable=False)  # цена или процент для move_pct
+    window_minutes = Column(Integer, nullable=True)  # только для move_pct
+    active = Column(Boolean, nullable=False, default=True)
+    last_triggered_ts = Column(Integer, nullable=True)  # UNIX timestamp
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Время последнего изменения через API (для аудита); устаревший индекс
+    # правил воркеры определяют по alert_rules_version
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<AlertRule(id={self.id}, ticker={self.ticker}, kind={self.kind}, threshold={self.threshold})>"
+
+
+class AlertRulesVersion(Base):
+    """Счетчик изменений правил: воркеры сверяют его вместо скана alert_rules на каждом тике"""
+    __tablename__ = "alert_rules_version"
+    
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False)
+
+
+class ScanCheckpoint(Base):
+    """Позиция, до которой история тикера уже проверена сканером качества"""
+    __tablename__ = "scan_checkpoints"
+    
+    ticker = Column(String, primary_key=True)
+    last_timestamp = Column(Integer, nullable=False)  # UNIX timestamp
+    scanned_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class DataQualityIssue(Base):
+    __tablename__ = "data_quality_issues"
+    __table_args__ = (
+        # Повторный скан того же участка не плодит одинаковые находки
+        UniqueConstraint("ticker", "kind", "timestamp", name="uq_data_quality_issue"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    ticker = Column(String, nullable=False)
+    kind = Column(String, nullable=False)  # gap, duplicate, jump
+    timestamp = Column(Integer, nullable=False)  # UNIX timestamp записи
+    prev_timestamp = Column(Integer, nullable=False)  # UNIX timestamp предыдущей записи
+    price = Column(Float, nullable=False)
+    prev_price = Column(Float, nullable=False)
+    detected_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<DataQualityIssue(ticker={self.ticker}, kind={self.kind}, timestamp={self.timestamp})>"
+
+
+class SchemaVersion(Base):
+    """Версия схемы: в режиме DB_STARTUP_MODE=check старт сверяет ее вместо create_all"""
+    __tablename__ = "schema_version"
+    
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
+    applied_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class Ticker(Base):
+    """Справочник тикеров для компактной схемы"""
+    __tablename__ = "tickers"
+    
+    # integer, а не smallint: в bulk-режиме инструментов (с экспирациями) десятки тысяч
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String, unique=True, nullable=False)
+
+
+class TickerPrice(Base):
+    """Компактная строка цены: ~20 байт данных против ~40 в ticker_data"""
+    __tablename__ = "ticker_prices"
+    __table_args__ = (
+        PrimaryKeyConstraint("ticker_id", "ts_ms"),
+        # BRIN по времени: данные пишутся по возрастанию, индекс весит килобайты
+        Index("ix_ticker_prices_ts_brin", "ts_ms", postgresql_using="brin"),
+    )
+    
+    # Порядок колонок подобран под выравнивание: 8 + 8 + 4 байта
+    ts_ms = Column(BigInteger, nullable=False)  # UNIX timestamp в миллисекундах
+    price = Column(Float, nullable=False)
+    ticker_id = Column(Integer, ForeignKey("tickers.id"), nullable=False)
+    
+    def __repr__(self):
+        return f"<TickerPrice(ticker_id={self.ticker_id}, price={self.price}, ts_ms={self.ts_ms})>"
\ No newline at end of file
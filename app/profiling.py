@@ -0,0 +1,222 @@
+"""
+Профилирование запросов (включается через PROFILING_ENABLED=1).
+
+- Заголовок Server-Timing с длительностью фаз: db (SQL), orm (обработчик без SQL:
+  гидратация ORM и логика), validate (валидация response_model и зависимости),
+  serialize (рендер JSON), total.
+- Лог медленных SQL-запросов через события before/after_cursor_execute.
+- Каждый N-й запрос (PROFILE_SAMPLE_RATE) профилируется cProfile, результат
+  сохраняется в PROFILE_DIR.
+"""
+import asyncio
+import cProfile
+import functools
+import itertools
+import json
+import os
+import re
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Optional
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+PROFILE_SAMPLE_RATE = int(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # 0 - выключено
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "/tmp/deribit_profiles"))
+PARAMS_PREVIEW_ROWS = 3
+PARAMS_PREVIEW_CHARS = 1000
+
+
+class RequestTimings:
+    """Накопитель длительностей фаз одного запроса (в секундах)"""
+
+    def __init__(self, sample: bool = False):
+        self.started = time.perf_counter()
+        self.sample = sample
+        self.db = 0.0
+        self.handler = 0.0
+        self.route = 0.0
+        self.serialize = 0.0
+        self.queries = 0
+
+    def server_timing(self) -> str:
+        total = time.perf_counter() - self.started
+        phases = {
+            "db": self.db,
+            "orm": max(self.handler - self.db, 0.0),
+            "validate": max(self.route - self.handler - self.serialize, 0.0),
+            "serialize": self.serialize,
+            "total": total,
+        }
+        parts = [f"{name};dur={value * 1000:.2f}" for name, value in phases.items()]
+        # Одна запись на фазу: описание db дописываем к ее длительности
+        parts[0] += f';desc="{self.queries} queries"'
+        return ", ".join(parts)
+
+
+# Объект изменяемый, поэтому потоки threadpool с копией контекста пишут в него же
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def _params_preview(parameters, executemany: bool):
+    """Параметры для лога: у executemany - первые строки и их число, длинное обрезается"""
+    if executemany and isinstance(parameters, (list, tuple)) and len(parameters) > PARAMS_PREVIEW_ROWS:
+        parameters = {"first": list(parameters[:PARAMS_PREVIEW_ROWS]), "rows": len(parameters)}
+    preview = json.dumps(parameters, default=str)
+    if len(preview) > PARAMS_PREVIEW_CHARS:
+        return f"{preview[:PARAMS_PREVIEW_CHARS]}... ({len(preview)} chars)"
+    return parameters
+
+
+# Время старта храним в контексте выполнения: запрос с ошибкой не доходит до
+# after_cursor_execute, и счетчик на соединении копился бы в пуле
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._profiling_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_profiling_start", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    timings = _current.get()
+    if timings is not None:
+        timings.db += elapsed
+        timings.queries += 1
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        record = {
+            "duration_ms": round(elapsed * 1000, 2),
+            "sql": statement,
+            "params": _params_preview(parameters, executemany),
+            "executemany": executemany,
+        }
+        print(f"🐢 Slow query: {json.dumps(record, default=str)}")
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse, замеряющий время сериализации"""
+
+    def render(self, content) -> bytes:
+        start = time.perf_counter()
+        try:
+            return super().render(content)
+        finally:
+            timings = _current.get()
+            if timings is not None:
+                timings.serialize += time.perf_counter() - start
+
+
+def _dump_profile(profiler: cProfile.Profile, name: str):
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    safe_name = re.sub(r"[^A-Za-z0-9_]+", "_", name).strip("_") or "root"
+    path = PROFILE_DIR / f"{int(time.time() * 1000)}_{safe_name}.prof"
+    profiler.dump_stats(str(path))
+    print(f"📊 Profile saved: {path}")
+
+
+def _timed_endpoint(endpoint):
+    """Оборачивает обработчик: время фазы handler и cProfile для выбранных запросов"""
+
+    def _start():
+        timings = _current.get()
+        profiler = None
+        if timings is not None and timings.sample:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        return timings, profiler, time.perf_counter()
+
+    def _finish(timings, profiler, start):
+        if timings is not None:
+            timings.handler += time.perf_counter() - start
+        if profiler is not None:
+            profiler.disable()
+            _dump_profile(profiler, endpoint.__name__)
+
+    # FastAPI смотрит на iscoroutinefunction, чтобы решить, запускать ли в threadpool
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            state = _start()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _finish(*state)
+        return async_wrapper
+
+    @functools.wraps(endpoint)
+    def sync_wrapper(*args, **kwargs):
+        state = _start()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            _finish(*state)
+    return sync_wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """APIRoute, замеряющий обработчик и весь путь до готового ответа"""
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            start = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                timings = _current.get()
+                if timings is not None:
+                    timings.route += time.perf_counter() - start
+        return timed_handler
+
+
+class ProfilingMiddleware:
+    """ASGI middleware: создает RequestTimings и добавляет заголовок Server-Timing"""
+
+    def __init__(self, app, sample_rate: int = PROFILE_SAMPLE_RATE):
+        self.app = app
+        self.sample_rate = sample_rate
+        self._counter = itertools.count(1)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        sample = self.sample_rate > 0 and next(self._counter) % self.sample_rate == 0
+        timings = RequestTimings(sample=sample)
+        token = _current.set(timings)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timings.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+
+
+def install(app):
+    """Подключает профилирование. Вызывать до объявления маршрутов"""
+    app.router.route_class = ProfiledRoute
+    app.router.default_response_class = TimedJSONResponse
+    app.add_middleware(ProfilingMiddleware)
+    # Слушаем класс Engine - покрывает primary и все реплики
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    print(f"⏱️  Profiling enabled (slow query >= {SLOW_QUERY_MS}ms, sample 1/{PROFILE_SAMPLE_RATE or '∞'})")
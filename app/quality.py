@@ -0,0 +1,193 @@
+"""
+Сканер качества истории цен: пропуски, дубликаты и выбросы.
+
+Читает ticker_data, а при STORAGE_LAYOUT=compact - ticker_prices (туда идет запись).
+
+Вся работа выполняется в БД оконными функциями по индексу (ticker, timestamp),
+в Python попадают только счетчики. Найденные проблемы пишутся в
+data_quality_issues, позиция скана - в scan_checkpoints, поэтому повторный
+запуск смотрит только новые строки. Находки проверяемого участка перед
+вставкой удаляются, поэтому повторный скан отражает текущие данные; строки,
+дописанные задним числом ниже позиции, учитывает только --full. Большие
+таблицы обрабатываются кусками по времени с сохранением позиции после
+каждого куска.
+
+Запуск:
+    python -m app.quality [--ticker btc_usd] [--full]
+"""
+import argparse
+import os
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from .compact import COMPACT_LAYOUT
+
+QUALITY_EXPECTED_INTERVAL = int(os.getenv("QUALITY_EXPECTED_INTERVAL", "60"))  # сек
+QUALITY_GAP_FACTOR = float(os.getenv("QUALITY_GAP_FACTOR", "1.5"))
+QUALITY_DUPLICATE_FACTOR = float(os.getenv("QUALITY_DUPLICATE_FACTOR", "0.5"))
+QUALITY_JUMP_PCT = float(os.getenv("QUALITY_JUMP_PCT", "5"))
+QUALITY_CHUNK_SECONDS = int(os.getenv("QUALITY_CHUNK_SECONDS", str(7 * 24 * 60 * 60)))
+
+# DISTINCT ticker через skip-scan по индексу, без чтения всей таблицы
+TICKERS_SQL = text("""
+    WITH RECURSIVE t AS (
+        SELECT min(ticker) AS ticker FROM ticker_data
+        UNION ALL
+        SELECT (SELECT min(ticker) FROM ticker_data WHERE ticker > t.ticker)
+        FROM t WHERE t.ticker IS NOT NULL
+    )
+    SELECT ticker FROM t WHERE ticker IS NOT NULL
+""")
+
+# Ряд тикера и его границы для обеих схем; в компактной фильтр по ts_ms, чтобы работал индекс
+SOURCES = {
+    "legacy": {
+        "tickers": TICKERS_SQL,
+        "series": """
+            SELECT timestamp, price FROM ticker_data
+            WHERE ticker = :ticker AND timestamp >= :lo AND timestamp <= :hi
+        """,
+        "first": "SELECT min(timestamp) FROM ticker_data WHERE ticker = :ticker",
+        "last": "SELECT max(timestamp) FROM ticker_data WHERE ticker = :ticker",
+        "last_before": "SELECT max(timestamp) FROM ticker_data WHERE ticker = :ticker AND timestamp <= :hi",
+    },
+    "compact": {
+        "tickers": text("SELECT name FROM tickers ORDER BY name"),
+        "series": """
+            SELECT p.ts_ms / 1000 AS timestamp, p.price FROM ticker_prices p
+            JOIN tickers t ON t.id = p.ticker_id
+            WHERE t.name = :ticker
+              AND p.ts_ms >= CAST(:lo AS bigint) * 1000 AND p.ts_ms <= CAST(:hi AS bigint) * 1000
+        """,
+        "first": """
+            SELECT min(p.ts_ms) / 1000 FROM ticker_prices p
+            JOIN tickers t ON t.id = p.ticker_id WHERE t.name = :ticker
+        """,
+        "last": """
+            SELECT max(p.ts_ms) / 1000 FROM ticker_prices p
+            JOIN tickers t ON t.id = p.ticker_id WHERE t.name = :ticker
+        """,
+        "last_before": """
+            SELECT max(p.ts_ms) / 1000 FROM ticker_prices p
+            JOIN tickers t ON t.id = p.ticker_id
+            WHERE t.name = :ticker AND p.ts_ms <= CAST(:hi AS bigint) * 1000
+        """,
+    },
+}
+SOURCE = SOURCES["compact" if COMPACT_LAYOUT else "legacy"]
+
+# Первая строка куска - последняя уже проверенная, она дает lag для новых строк
+SCAN_CHUNK_SQL = text("""
+    WITH w AS (
+        SELECT timestamp, price,
+               lag(timestamp) OVER (ORDER BY timestamp) AS prev_timestamp,
+               lag(price) OVER (ORDER BY timestamp) AS prev_price
+        FROM ({series}) s
+    ),
+    issues AS (
+        SELECT timestamp, prev_timestamp, price, prev_price,
+               CASE
+                   WHEN timestamp - prev_timestamp > :max_gap THEN 'gap'
+                   WHEN timestamp - prev_timestamp < :min_spacing THEN 'duplicate'
+                   ELSE 'jump'
+               END AS kind
+        FROM w
+        WHERE prev_timestamp IS NOT NULL
+          AND (timestamp - prev_timestamp > :max_gap
+               OR timestamp - prev_timestamp < :min_spacing
+               OR abs(price - prev_price) > :jump_ratio * abs(prev_price))
+    ),
+    inserted AS (
+        INSERT INTO data_quality_issues (ticker, kind, timestamp, prev_timestamp, price, prev_price)
+        SELECT :ticker, kind, timestamp, prev_timestamp, price, prev_price FROM issues
+        ON CONFLICT ON CONSTRAINT uq_data_quality_issue DO NOTHING
+        RETURNING kind
+    )
+    SELECT kind, count(*) FROM inserted GROUP BY kind
+""".format(series=SOURCE["series"]))
+
+# Находки участка пересчитываются заново: пропуск, заполненный позже (повторный
+# запуск слота), не должен оставаться в отчете навсегда
+DELETE_ISSUES_SQL = text("""
+    DELETE FROM data_quality_issues
+    WHERE ticker = :ticker AND timestamp >= :lo AND timestamp <= :hi
+""")
+
+UPSERT_CHECKPOINT_SQL = text("""
+    INSERT INTO scan_checkpoints (ticker, last_timestamp, scanned_at)
+    VALUES (:ticker, :last_timestamp, now())
+    ON CONFLICT (ticker) DO UPDATE
+    SET last_timestamp = excluded.last_timestamp, scanned_at = excluded.scanned_at
+""")
+
+
+def _scalar(db: Session, sql: str, **params):
+    return db.execute(text(sql), params).scalar()
+
+
+def scan_ticker(db: Session, ticker: str, full: bool = False,
+                expected_interval: int = QUALITY_EXPECTED_INTERVAL,
+                jump_pct: float = QUALITY_JUMP_PCT,
+                chunk_seconds: int = QUALITY_CHUNK_SECONDS) -> dict:
+    """Проверяет строки тикера после сохраненной позиции (или всю историю при full)"""
+    checkpoint = None if full else _scalar(
+        db, "SELECT last_timestamp FROM scan_checkpoints WHERE ticker = :ticker", ticker=ticker
+    )
+    # min/max по индексу (ticker, timestamp) - без скана таблицы
+    start = checkpoint if checkpoint is not None else _scalar(db, SOURCE["first"], ticker=ticker)
+    end = _scalar(db, SOURCE["last"], ticker=ticker)
+    result = {"ticker": ticker, "scanned_from": start, "scanned_to": end, "issues": {}}
+    if start is None or end is None:
+        return result
+
+    params = {
+        "ticker": ticker,
+        "max_gap": expected_interval * QUALITY_GAP_FACTOR,
+        "min_spacing": expected_interval * QUALITY_DUPLICATE_FACTOR,
+        "jump_ratio": jump_pct / 100,
+    }
+    lo = hi = start
+    # Строка на границе lo уже проверена предыдущим куском (она только дает lag),
+    # ее находку не трогаем - кроме самой первой строки полного скана
+    clear_from = start if checkpoint is None else start + 1
+    while hi < end:
+        hi = min(hi + chunk_seconds, end)
+        # В той же транзакции, что и вставка: читатели не видят участок пустым
+        db.execute(DELETE_ISSUES_SQL, {"ticker": ticker, "lo": clear_from, "hi": hi})
+        for kind, count in db.execute(SCAN_CHUNK_SQL, {**params, "lo": lo, "hi": hi}):
+            result["issues"][kind] = result["issues"].get(kind, 0) + count
+        # Позицию сохраняем после каждого куска - прерванный скан продолжится с нее
+        lo = _scalar(db, SOURCE["last_before"], ticker=ticker, hi=hi)
+        clear_from = hi + 1
+        db.execute(UPSERT_CHECKPOINT_SQL, {"ticker": ticker, "last_timestamp": lo})
+        db.commit()
+    return result
+
+
+def scan(db: Session, tickers: Optional[List[str]] = None, full: bool = False) -> List[dict]:
+    """Инкрементальный скан всех (или выбранных) тикеров"""
+    if tickers is None:
+        tickers = [row[0] for row in db.execute(SOURCE["tickers"])]
+    results = []
+    for ticker in tickers:
+        result = scan_ticker(db, ticker, full=full)
+        print(f"🔎 {ticker}: {result['issues'] or 'no new issues'}")
+        results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Scan price history for gaps, duplicates and outlier jumps")
+    parser.add_argument("--ticker", action="append", help="Тикер (можно несколько раз); по умолчанию все")
+    parser.add_argument("--full", action="store_true", help="Игнорировать сохраненную позицию")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        scan(db, tickers=args.ticker, full=args.full)
+    finally:
+        db.close()
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Literal, Optional
 from datetime import datetime
 
 class TickerDataBase(BaseModel):
@@ -11,7 +11,7 @@ class TickerDataCreate(TickerDataBase):
     pass
 
 class TickerData(TickerDataBase):
-    id: int
+    id: Optional[int] = None  # в компактной схеме (STORAGE_LAYOUT=compact) суррогатного id нет
     created_at: datetime
     
     class Config:
@@ -29,6 +29,110 @@ class PriceResponse(BaseModel):
     timestamp: int
     created_at: datetime
 
+class DashboardTicker(BaseModel):
+    ticker: str
+    latest: Optional[TickerData] = None
+    series: List[TickerData]  # от старых к новым
+
+class DashboardHistory(BaseModel):
+    ticker: str
+    data: List[TickerData]  # от новых к старым
+    count: int
+
+class DashboardBootstrapResponse(BaseModel):
+    success: bool = True
+    tickers: List[DashboardTicker]
+    history: DashboardHistory
+
+class PriceLookup(BaseModel):
+    ticker: str
+    date: datetime
+
+class BatchPriceRequest(BaseModel):
+    items: List[PriceLookup] = Field(..., min_length=1, max_length=50000)
+
+class BatchPriceItem(BaseModel):
+    ticker: str
+    date: datetime
+    found: bool
+    price: Optional[float] = None
+    timestamp: Optional[int] = None
+    created_at: Optional[datetime] = None
+
+class BatchPriceResponse(BaseModel):
+    success: bool = True
+    data: List[BatchPriceItem]
+    count: int
+
+class AlertRuleCreate(BaseModel):
+    ticker: str
+    kind: Literal["cross_above", "cross_below", "move_pct"]
+    threshold: float = Field(..., gt=0)
+    window_minutes: Optional[int] = Field(None, gt=0)
+    
+    @model_validator(mode="after")
+    def check_window(self):
+        if self.kind == "move_pct" and self.window_minutes is None:
+            raise ValueError("window_minutes is required for move_pct rules")
+        if self.kind != "move_pct":
+            self.window_minutes = None
+        return self
+
+class AlertRule(AlertRuleCreate):
+    id: int
+    active: bool
+    last_triggered_ts: Optional[int] = None
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+class AlertRuleListResponse(BaseModel):
+    success: bool = True
+    data: List[AlertRule]
+    count: int
+
+class CrossSeriesResponse(BaseModel):
+    """Выровненные ряды в колоночном виде"""
+    success: bool = True
+    base: str
+    quote: str
+    window: int
+    count: int
+    timestamps: List[int]
+    base_prices: List[float]
+    quote_prices: List[float]
+    ratio: List[float]
+    correlation: List[Optional[float]]
+
+class DataQualityIssue(BaseModel):
+    id: int
+    ticker: str
+    kind: str
+    timestamp: int
+    prev_timestamp: int
+    price: float
+    prev_price: float
+    detected_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+class DataQualityIssueListResponse(BaseModel):
+    success: bool = True
+    data: List[DataQualityIssue]
+    count: int
+
+class QualityScanTickerResult(BaseModel):
+    ticker: str
+    scanned_from: Optional[int] = None
+    scanned_to: Optional[int] = None
+    issues: dict
+
+class QualityScanResponse(BaseModel):
+    success: bool = True
+    data: List[QualityScanTickerResult]
+
 class ErrorResponse(BaseModel):
     success: bool = False
     error: str
\ No newline at end of file
@@ -0,0 +1,75 @@
+"""
+Single-flight: объединение одинаковых одновременных запросов на чтение.
+
+Первый вызов с ключом (функция, аргументы) выполняет запрос к БД, все
+параллельные вызовы с тем же ключом ждут и получают тот же результат.
+Синхронные эндпоинты FastAPI работают в threadpool, поэтому синхронизация
+через threading.
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+
+def _freeze(value) -> Hashable:
+    """Приводит аргументы к хешируемому виду (списки -> кортежи)"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Объединяет одновременные вызовы с одинаковым ключом в один"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._stats = {"calls": 0, "executed": 0, "coalesced": 0}
+
+    def do(self, fn: Callable, db, *args, **kwargs) -> Any:
+        """Вызывает fn(db, *args, **kwargs); сессия db в ключ не входит"""
+        key = (fn.__module__, fn.__qualname__, _freeze(args), _freeze(kwargs))
+
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self._stats["executed"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(db, *args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            # Следующий вызов после завершения уже пойдет в БД заново
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "in_flight": len(self._calls)}
+
+
+read_flight = SingleFlight()
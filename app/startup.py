@@ -0,0 +1,93 @@
+"""
+Прогрев процесса перед тем, как /health начнет отвечать ready.
+
+В фоне сверяется схема, открываются соединения пула, выполняются горячие
+запросы (заполняют кэш скомпилированных SQLAlchemy-запросов и shared buffers
+Postgres) и строится индекс архива. Пока прогрев не закончен, /health отвечает
+503 со статусом starting (или error с текстом последней ошибки). Если БД еще
+недоступна, попытка повторяется каждые STARTUP_RETRY_INTERVAL секунд - процесс
+не остается неготовым навсегда. Реплики прогреваются по возможности: упавшую
+реплику read_router пометит нездоровой, и чтения пойдут в primary.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from .database import DB_POOL_SIZE, engine, init_db, read_router, warm_pool
+
+DB_POOL_WARM = int(os.getenv("DB_POOL_WARM", str(DB_POOL_SIZE)))
+STARTUP_RETRY_INTERVAL = float(os.getenv("STARTUP_RETRY_INTERVAL", "5"))  # сек
+
+
+class Readiness:
+    def __init__(self):
+        self.status = "starting"
+        self.error: Optional[str] = None
+        self.warmup_seconds: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def fail(self, error: Exception):
+        self.status = "error"
+        self.error = str(error)
+
+
+state = Readiness()
+
+
+def warm_up(tickers: List[str]):
+    """Открывает соединения и прогревает горячие пути"""
+    from . import crud
+    from .archive import store as archive_store
+
+    started = time.perf_counter()
+    opened = warm_pool(engine, DB_POOL_WARM)
+    for replica_engine in read_router.engines:
+        # Недоступная реплика не мешает готовности - ее отсечет проверка здоровья
+        try:
+            warm_pool(replica_engine, DB_POOL_WARM)
+        except Exception as e:
+            print(f"⚠️  Replica {replica_engine.url} warm-up skipped: {e}")
+    read_router.start()
+
+    db = read_router.session()
+    try:
+        crud.get_recent_ticker_data(db, tickers, limit=50)
+        for ticker in tickers:
+            crud.get_latest_price(db, ticker)
+            crud.get_ticker_data(db, ticker, limit=50)
+        crud.get_prices_by_dates(db, [(ticker, datetime.now()) for ticker in tickers])
+    finally:
+        db.close()
+
+    for ticker in tickers:
+        archive_store.count(ticker)
+
+    state.warmup_seconds = round(time.perf_counter() - started, 3)
+    print(f"✅ Warm-up done in {state.warmup_seconds}s ({opened} pooled connections)")
+
+
+def prepare(tickers: List[str], retry_interval: float = STARTUP_RETRY_INTERVAL):
+    """Сверка схемы и прогрев; при ошибке повторяет, пока не получится"""
+    while True:
+        try:
+            init_db()
+            print("✅ Database initialized")
+            warm_up(tickers)
+        except Exception as e:
+            print(f"⚠️  Startup failed, retrying in {retry_interval}s: {e}")
+            state.fail(e)
+            time.sleep(retry_interval)
+            continue
+        state.error = None
+        state.status = "ready"
+        return
+
+
+def start(tickers: List[str]):
+    """Запускает подготовку в фоне - процесс уже принимает /health и отвечает starting"""
+    threading.Thread(target=prepare, args=(tickers,), name="startup", daemon=True).start()
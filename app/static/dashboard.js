@@ -0,0 +1,382 @@
+// Храним историю цен для графиков
+let priceHistory = {
+    btc: [],
+    eth: []
+};
+
+// Храним последние полученные timestamp'ы
+let lastTimestamps = {
+    btc: null,
+    eth: null
+};
+
+// Контексты canvas
+const btcCanvas = document.getElementById('btc-graph');
+const ethCanvas = document.getElementById('eth-graph');
+const btcCtx = btcCanvas.getContext('2d');
+const ethCtx = ethCanvas.getContext('2d');
+
+// Инициализация размеров canvas
+function initCanvases() {
+    const containers = document.querySelectorAll('.graph-container');
+    containers.forEach(container => {
+        const canvas = container.querySelector('canvas');
+        canvas.width = container.clientWidth;
+        canvas.height = container.clientHeight;
+    });
+}
+
+// Функция форматирования цены
+function formatPrice(price) {
+    return '$' + price.toLocaleString('en-US', {
+        minimumFractionDigits: 2,
+        maximumFractionDigits: 2
+    });
+}
+
+// Функция рисования графика
+function drawGraph(ctx, prices, color) {
+    if (!prices || prices.length < 2) {
+        // Очищаем canvas если данных мало
+        ctx.clearRect(0, 0, ctx.canvas.width, ctx.canvas.height);
+        ctx.fillStyle = '#999';
+        ctx.font = '14px Arial';
+        ctx.textAlign = 'center';
+        ctx.fillText('Waiting for data...', ctx.canvas.width / 2, ctx.canvas.height / 2);
+        return;
+    }
+    
+    // Очищаем canvas
+    ctx.clearRect(0, 0, ctx.canvas.width, ctx.canvas.height);
+    
+    const width = ctx.canvas.width;
+    const height = ctx.canvas.height;
+    const padding = 20;
+    
+    // Находим min и max цены
+    const minPrice = Math.min(...prices);
+    const maxPrice = Math.max(...prices);
+    const priceRange = maxPrice - minPrice || 1;
+    
+    // Рисуем сетку
+    ctx.strokeStyle = '#e0e0e0';
+    ctx.lineWidth = 1;
+    
+    // Горизонтальные линии
+    for (let i = 0; i <= 4; i++) {
+        const y = padding + (height - 2 * padding) * (i / 4);
+        ctx.beginPath();
+        ctx.moveTo(padding, y);
+        ctx.lineTo(width - padding, y);
+        ctx.stroke();
+        
+        // Подписи цен
+        const price = maxPrice - (priceRange * i / 4);
+        ctx.fillStyle = '#666';
+        ctx.font = '10px Arial';
+        ctx.textAlign = 'left';
+        ctx.fillText(formatPrice(price).slice(0, 10), 5, y - 2);
+    }
+    
+    // Рисуем линию графика
+    ctx.beginPath();
+    ctx.strokeStyle = color;
+    ctx.lineWidth = 2;
+    ctx.lineJoin = 'round';
+    
+    const pointCount = prices.length;
+    for (let i = 0; i < pointCount; i++) {
+        const x = padding + (width - 2 * padding) * (i / (pointCount - 1));
+        const y = padding + (height - 2 * padding) * (1 - (prices[i] - minPrice) / priceRange);
+        
+        if (i === 0) {
+            ctx.moveTo(x, y);
+        } else {
+            ctx.lineTo(x, y);
+        }
+    }
+    
+    ctx.stroke();
+    
+    // Рисуем точки (только первую, последнюю и каждую 5-ю)
+    ctx.fillStyle = color;
+    for (let i = 0; i < pointCount; i++) {
+        // Показываем точки: первую, последнюю и каждую 5-ю
+        if (i === 0 || i === pointCount - 1 || i % 5 === 0) {
+            const x = padding + (width - 2 * padding) * (i / (pointCount - 1));
+            const y = padding + (height - 2 * padding) * (1 - (prices[i] - minPrice) / priceRange);
+            
+            ctx.beginPath();
+            ctx.arc(x, y, 3, 0, Math.PI * 2);
+            ctx.fill();
+        }
+    }
+    
+    // Добавляем легенду (процент изменения)
+    if (prices.length > 1) {
+        const latestPrice = prices[prices.length - 1];
+        const firstPrice = prices[0];
+        const change = latestPrice - firstPrice;
+        const changePercent = ((change / firstPrice) * 100).toFixed(2);
+        
+        ctx.fillStyle = change >= 0 ? '#4caf50' : '#f44336';
+        ctx.font = 'bold 12px Arial';
+        ctx.textAlign = 'right';
+        ctx.fillText(
+            `${change >= 0 ? '+' : ''}${changePercent}%`,
+            width - padding,
+            padding + 15
+        );
+    }
+}
+
+// Функция обновления цены и графика (только при новых данных)
+async function updatePrice(ticker, elementId) {
+    try {
+        const response = await fetch(`/api/ticker/latest?ticker=${ticker}`);
+        
+        if (!response.ok) {
+            throw new Error(`HTTP error: ${response.status}`);
+        }
+        
+        const data = await response.json();
+        
+        if (data.success) {
+            const priceElement = document.getElementById(`${elementId}-price`);
+            const boxElement = document.querySelector(`.${elementId}`);
+            const timeElement = document.getElementById(`${elementId}-time`);
+            
+            const currentPrice = data.price;
+            const currentTimestamp = data.timestamp;
+            
+            // Проверяем, новые ли это данные (по timestamp)
+            if (lastTimestamps[elementId] !== currentTimestamp) {
+                console.log(`New data for ${ticker}: ${currentPrice} at ${currentTimestamp}`);
+                
+                // Обновляем цену
+                priceElement.textContent = formatPrice(currentPrice);
+                
+                // Определяем состояние (up/down/neutral)
+                let state = 'neutral';
+                if (priceHistory[elementId].length > 0) {
+                    const previousPrice = priceHistory[elementId][priceHistory[elementId].length - 1];
+                    if (currentPrice > previousPrice) {
+                        state = 'up';
+                    } else if (currentPrice < previousPrice) {
+                        state = 'down';
+                    }
+                }
+                
+                // Применяем стили
+                priceElement.className = `price ${state}`;
+                boxElement.className = `price-box ${elementId} ${state}`;
+                
+                // Добавляем цену в историю для графика
+                priceHistory[elementId].push(currentPrice);
+                
+                // Ограничиваем историю до 20 точек (примерно 20 минут данных)
+                if (priceHistory[elementId].length > 20) {
+                    priceHistory[elementId].shift();
+                }
+                
+                // Обновляем график только при новых данных
+                const ctx = elementId === 'btc' ? btcCtx : ethCtx;
+                const color = elementId === 'btc' ? '#f7931a' : '#627eea';
+                drawGraph(ctx, priceHistory[elementId], color);
+                
+                // Сохраняем timestamp
+                lastTimestamps[elementId] = currentTimestamp;
+            }
+            
+            // Всегда обновляем время (даже если данные те же)
+            if (data.created_at) {
+                const updateTime = new Date(data.created_at);
+                timeElement.textContent = `Last update: ${updateTime.toLocaleTimeString()}`;
+            }
+            
+            return true;
+        }
+    } catch (error) {
+        console.error(`Error updating ${ticker}:`, error);
+        const priceElement = document.getElementById(`${elementId}-price`);
+        priceElement.textContent = 'Error';
+        priceElement.className = 'price down';
+        timeElement.textContent = 'Connection error';
+        return false;
+    }
+}
+
+// Функция отрисовки таблицы истории
+function renderHistoryTable(container, items) {
+    let html = `
+        <div style="margin-bottom: 15px; color: #666;">
+            Showing ${items.length} records (updated every minute)
+        </div>
+        <table class="history-table">
+            <thead>
+                <tr>
+                    <th>Time</th>
+                    <th>Price</th>
+                    <th>Timestamp</th>
+                </tr>
+            </thead>
+            <tbody>
+    `;
+    
+    items.forEach(item => {
+        const date = new Date(item.created_at);
+        html += `
+            <tr>
+                <td>${date.toLocaleString()}</td>
+                <td style="font-family: 'Courier New', monospace; font-weight: bold;">
+                    ${formatPrice(item.price)}
+                </td>
+                <td style="color: #666; font-size: 0.9em;">
+                    ${item.timestamp}
+                </td>
+            </tr>
+        `;
+    });
+    
+    html += '</tbody></table>';
+    container.innerHTML = html;
+}
+
+// Функция загрузки истории
+async function loadHistory() {
+    const ticker = document.getElementById('history-ticker').value;
+    const dateFilter = document.getElementById('date-filter').value;
+    const container = document.getElementById('history-content');
+    
+    container.innerHTML = '<div class="loading">Loading data...</div>';
+    
+    try {
+        let url = `/api/ticker/data?ticker=${ticker}&limit=50`;
+        
+        // Если есть фильтр по дате, используем другой эндпоинт
+        if (dateFilter) {
+            const date = new Date(dateFilter);
+            const isoDate = date.toISOString();
+            url = `/api/ticker/price?ticker=${ticker}&date=${encodeURIComponent(isoDate)}`;
+            
+            const response = await fetch(url);
+            const data = await response.json();
+            
+            if (data.success) {
+                const dateObj = new Date(data.created_at);
+                container.innerHTML = `
+                    <div>
+                        <h3>Price at ${dateObj.toLocaleString()}:</h3>
+                        <div style="font-size: 24px; font-weight: bold; margin: 20px 0;">
+                            ${formatPrice(data.price)}
+                        </div>
+                        <div style="color: #666;">
+                            Ticker: ${data.ticker}<br>
+                            Timestamp: ${data.timestamp}<br>
+                            Recorded: ${dateObj.toLocaleString()}
+                        </div>
+                    </div>
+                `;
+            } else {
+                container.innerHTML = `<div class="error">${data.detail || 'No data found for this date'}</div>`;
+            }
+        } else {
+            // Загрузка всех данных
+            const response = await fetch(url);
+            const data = await response.json();
+            
+            if (data.success && data.data.length > 0) {
+                renderHistoryTable(container, data.data);
+            } else {
+                container.innerHTML = '<div class="loading">No data available yet. Data is collected every minute.</div>';
+            }
+        }
+    } catch (error) {
+        console.error('Error loading history:', error);
+        container.innerHTML = `<div class="error">Error: ${error.message}</div>`;
+    }
+}
+
+// Функция очистки фильтра
+function clearFilter() {
+    document.getElementById('date-filter').value = '';
+    loadHistory();
+}
+
+// Функция обновления всех текущих цен
+async function refreshAll() {
+    await updatePrice('btc_usd', 'btc');
+    await updatePrice('eth_usd', 'eth');
+}
+
+// Загрузка всех данных для первой отрисовки одним запросом
+async function bootstrapDashboard() {
+    const historyTicker = document.getElementById('history-ticker').value;
+    const response = await fetch(`/api/dashboard/bootstrap?history_ticker=${historyTicker}&series_limit=20&history_limit=50`);
+    
+    if (!response.ok) {
+        throw new Error(`HTTP error: ${response.status}`);
+    }
+    
+    const data = await response.json();
+    
+    data.tickers.forEach(entry => {
+        const elementId = entry.ticker === 'btc_usd' ? 'btc' : 'eth';
+        
+        // Точки графика уже упорядочены от старых к новым
+        priceHistory[elementId] = entry.series.map(item => item.price);
+        
+        if (entry.latest) {
+            document.getElementById(`${elementId}-price`).textContent = formatPrice(entry.latest.price);
+            document.getElementById(`${elementId}-time`).textContent =
+                `Last update: ${new Date(entry.latest.created_at).toLocaleTimeString()}`;
+            lastTimestamps[elementId] = entry.latest.timestamp;
+        }
+        
+        // Рисуем график
+        const ctx = elementId === 'btc' ? btcCtx : ethCtx;
+        const color = elementId === 'btc' ? '#f7931a' : '#627eea';
+        drawGraph(ctx, priceHistory[elementId], color);
+    });
+    
+    const container = document.getElementById('history-content');
+    if (data.history.data.length > 0) {
+        renderHistoryTable(container, data.history.data);
+    } else {
+        container.innerHTML = '<div class="loading">No data available yet. Data is collected every minute.</div>';
+    }
+}
+
+// Инициализация
+window.onload = function() {
+    // Инициализируем размеры canvas
+    initCanvases();
+    
+    // Графики, текущие цены и первая страница истории - одним запросом
+    bootstrapDashboard().catch(error => {
+        console.error('Error loading dashboard bootstrap:', error);
+        refreshAll();
+        loadHistory();
+    });
+    
+    // Автообновление текущих цен каждые 5 секунд (проверка новых данных)
+    setInterval(refreshAll, 5000);
+    
+    // Автообновление истории каждые 30 секунд (только если нет фильтра по дате)
+    setInterval(() => {
+        if (!document.getElementById('date-filter').value) {
+            loadHistory();
+        }
+    }, 30000);
+    
+    // Ресайз окна
+    window.addEventListener('resize', () => {
+        initCanvases();
+        // Перерисовываем графики
+        drawGraph(btcCtx, priceHistory.btc, '#f7931a');
+        drawGraph(ethCtx, priceHistory.eth, '#627eea');
+    });
+};
+
+// Инициализация canvas при загрузке DOM
+document.addEventListener('DOMContentLoaded', initCanvases);
@@ -1,12 +1,17 @@
 import aiohttp
 import asyncio
 from celery import Celery
+from celery.signals import worker_process_init
 from sqlalchemy.orm import Session
-from typing import Dict, Any
+from typing import Any, Dict, List, Optional
 import os
 from datetime import datetime
-from .database import SessionLocal
+from .database import SessionLocal, engine, warm_pool, DB_POOL_SIZE
 from . import crud, schemas
+from .alerts import alert_engine
+from .archive import archive_old_rows, ARCHIVE_AFTER_DAYS, ARCHIVE_DIR, ARCHIVE_ENABLED
+from .compact import COMPACT_LAYOUT
+from . import bulk
 import time
 
 # Настройка Celery
@@ -24,6 +29,16 @@ celery_app.conf.update(
     enable_utc=True,
 )
 
+@worker_process_init.connect
+def warm_worker_pool(**kwargs):
+    """Каждый дочерний процесс воркера открывает свой пул заранее (соединения нельзя делить после fork)"""
+    engine.dispose(close=False)
+    try:
+        opened = warm_pool(engine, min(DB_POOL_SIZE, 2))
+        print(f"✅ Worker pool warmed: {opened} connections")
+    except Exception as e:
+        print(f"⚠️  Worker pool warm-up failed: {e}")
+
 class DeribitClient:
     def __init__(self):
         self.base_url = os.getenv("DERIBIT_BASE_URL", "https://www.deribit.com/api/v2")
@@ -43,10 +58,28 @@ class DeribitClient:
                 else:
                     raise Exception(f"Error fetching price: {response.status}")
 
-async def fetch_prices():
+# Индексы, которые собираем: "btc,eth" -> btc_usd, eth_usd
+TICKERS = [t.strip() for t in os.getenv("DERIBIT_TICKERS", "btc,eth").split(",") if t.strip()]
+
+# index - индексные цены (get_index_price), bulk - все инструменты валют, both - оба
+INGESTION_MODE = os.getenv("INGESTION_MODE", "index")
+FETCH_INTERVAL = int(os.getenv("FETCH_INTERVAL", "60"))  # сек
+
+# Доставка алертов: попыток после первой и начальная пауза между ними
+ALERT_DELIVERY_RETRIES = int(os.getenv("ALERT_DELIVERY_RETRIES", "5"))
+ALERT_RETRY_DELAY = int(os.getenv("ALERT_RETRY_DELAY", "10"))  # сек
+
+def sample_slot(now: Optional[float] = None, interval: int = FETCH_INTERVAL) -> int:
+    """Начало слота сбора: ретрай, наложение запусков beat и ручной перезапуск
+    в пределах слота пишут ту же метку и перезаписывают цену, а не плодят строки"""
+    now = time.time() if now is None else now
+    return int(now) // interval * interval
+
+async def fetch_prices(tickers: Optional[List[str]] = None, timestamp: Optional[int] = None):
     """Асинхронная функция для получения цен"""
     client = DeribitClient()
-    tickers = ["btc", "eth"]
+    tickers = tickers or TICKERS
+    timestamp = sample_slot() if timestamp is None else timestamp
     results = []
     
     for ticker in tickers:
@@ -57,29 +90,68 @@ async def fetch_prices():
                 results.append({
                     "ticker": f"{ticker}_usd",
                     "price": price,
-                    "timestamp": int(time.time())
+                    "timestamp": timestamp
                 })
         except Exception as e:
             print(f"Error fetching {ticker} price: {e}")
     
     return results
 
+def store_prices(db: Session, prices_data: List[Dict[str, Any]], verbose: bool = True):
+    """Сохраняет пачку цен и проверяет по ним алерты"""
+    # Предыдущие цены нужны алертам для проверки пересечения уровней - только
+    # по тикерам с правилами и одним запросом (в bulk-режиме тикеров тысячи)
+    watched = alert_engine.watched(db)
+    checked = [price_data for price_data in prices_data if price_data["ticker"] in watched]
+    latest = crud.get_recent_ticker_data(db, [price_data["ticker"] for price_data in checked], limit=1) if checked else {}
+    prev_prices = {ticker: rows[0].price if rows else None for ticker, rows in latest.items()}
+    
+    items = [schemas.TickerDataCreate(**price_data) for price_data in prices_data]
+    crud.upsert_ticker_data(db, items)
+    if verbose:
+        for price_data in prices_data:
+            print(f"Saved {price_data['ticker']}: ${price_data['price']}")
+    
+    # Ошибка алертов не должна ломать сбор цен
+    alerts = []
+    for price_data in checked:
+        try:
+            alerts.extend(alert_engine.evaluate(
+                db,
+                price_data["ticker"],
+                prev_prices[price_data["ticker"]],
+                price_data["price"],
+                price_data["timestamp"]
+            ))
+        except Exception as e:
+            db.rollback()
+            print(f"Error evaluating alerts for {price_data['ticker']}: {e}")
+    # Отправка - отдельной задачей: медленный sink не задерживает цикл сбора
+    if alerts:
+        deliver_alerts.delay(alerts)
+
+@celery_app.task(bind=True, acks_late=True, max_retries=ALERT_DELIVERY_RETRIES)
+def deliver_alerts(self, alerts: List[dict]):
+    """Доставка сработавших алертов с повторами (пауза растет вдвое с каждой попыткой)"""
+    try:
+        alert_engine.deliver(alerts)
+    except Exception as e:
+        print(f"⚠️  Alert delivery failed (attempt {self.request.retries + 1}): {e}")
+        raise self.retry(exc=e, countdown=ALERT_RETRY_DELAY * 2 ** self.request.retries)
+
 @celery_app.task
-def save_prices_to_db():
-    """Celery задача для сохранения цен в базу данных"""
+def save_prices_to_db(slot: Optional[int] = None):
+    """Celery задача для сохранения цен в базу данных; slot - перезапуск конкретного слота"""
     # Запускаем асинхронную функцию
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     
     try:
-        prices_data = loop.run_until_complete(fetch_prices())
+        prices_data = loop.run_until_complete(fetch_prices(timestamp=slot))
         
         db = SessionLocal()
         try:
-            for price_data in prices_data:
-                ticker_data = schemas.TickerDataCreate(**price_data)
-                crud.create_ticker_data(db, ticker_data)
-                print(f"Saved {price_data['ticker']}: ${price_data['price']}")
+            store_prices(db, prices_data)
         finally:
             db.close()
     finally:
@@ -87,11 +159,66 @@ def save_prices_to_db():
     
     return {"success": True, "count": len(prices_data)}
 
+@celery_app.task
+def save_book_summaries(shard: int, slot: Optional[int] = None):
+    """Celery задача сбора всех инструментов валют своего шарда"""
+    currencies = bulk.assign_shards()[shard]
+    slot = sample_slot() if slot is None else slot
+    if not currencies:
+        return {"success": True, "count": 0}
+    
+    started = time.perf_counter()
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        prices_data = loop.run_until_complete(bulk.fetch_book_summaries(currencies, slot))
+    finally:
+        loop.close()
+    
+    db = SessionLocal()
+    try:
+        store_prices(db, prices_data, verbose=False)
+    finally:
+        db.close()
+    
+    elapsed = time.perf_counter() - started
+    print(f"📦 Shard {shard}: {len(prices_data)} instruments of {','.join(currencies)} in {elapsed:.2f}s")
+    if elapsed > FETCH_INTERVAL:
+        print(f"⚠️  Shard {shard} cycle took longer than {FETCH_INTERVAL:.0f}s - add shards")
+    return {"success": True, "count": len(prices_data), "seconds": round(elapsed, 3)}
+
+@celery_app.task
+def archive_old_data():
+    """Celery задача переноса старых строк в Parquet-архив"""
+    count = archive_old_rows(days=ARCHIVE_AFTER_DAYS)
+    return {"success": True, "count": count}
+
 # Периодическая задача каждую минуту
 @celery_app.on_after_configure.connect
 def setup_periodic_tasks(sender, **kwargs):
-    sender.add_periodic_task(
-        60.0,  # каждые 60 секунд
-        save_prices_to_db.s(),
-        name='fetch-and-save-prices-every-minute'
-    )
\ No newline at end of file
+    if INGESTION_MODE in ("index", "both"):
+        sender.add_periodic_task(
+            FETCH_INTERVAL,  # каждые 60 секунд
+            save_prices_to_db.s(),
+            name='fetch-and-save-prices-every-minute'
+        )
+    # По задаче на шард; с BULK_SHARD_QUEUES=1 - в очередь шарда (воркер: -Q bulk-0)
+    if INGESTION_MODE in ("bulk", "both"):
+        for shard in range(bulk.BULK_SHARDS):
+            options = {"queue": bulk.shard_name(shard)} if bulk.BULK_SHARD_QUEUES else {}
+            sender.add_periodic_task(
+                FETCH_INTERVAL,
+                save_book_summaries.s(shard).set(**options),
+                name=f'fetch-book-summaries-{bulk.shard_name(shard)}'
+            )
+    # Архивация раз в сутки; нужны ARCHIVE_AFTER_DAYS > 0 и явный постоянный ARCHIVE_DIR
+    if ARCHIVE_AFTER_DAYS > 0 and ARCHIVE_DIR is None:
+        print("⚠️  ARCHIVE_AFTER_DAYS is set but ARCHIVE_DIR is not - archiving stays disabled")
+    if ARCHIVE_AFTER_DAYS > 0 and COMPACT_LAYOUT:
+        print("⚠️  STORAGE_LAYOUT=compact - ticker_data archiving stays disabled")
+    if ARCHIVE_ENABLED:
+        sender.add_periodic_task(
+            24 * 60 * 60.0,
+            archive_old_data.s(),
+            name='archive-old-data-daily'
+        )
\ No newline at end of file
@@ -0,0 +1,194 @@
+"""
+Локальная замена Deribit API для нагрузочных тестов.
+
+HTTP: GET /api/v2/public/get_index_price?index_name=btc_usd
+      GET /api/v2/public/get_book_summary_by_currency?currency=BTC
+WebSocket: /ws/api/v2 (JSON-RPC с теми же методами)
+
+Задержка, разброс, доля ошибок и число инструментов настраиваются.
+
+Запуск отдельно:
+    python -m benchmarks.fake_deribit --port 8765 --latency-ms 50 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+
+from aiohttp import WSMsgType, web
+
+API_PREFIX = "/api/v2"
+
+
+def currency_names(count: int, prefix: Optional[str] = None) -> List[str]:
+    """btc, eth, затем синтетические c0002, c0003, ...; с prefix - только синтетические"""
+    if prefix:
+        return [f"{prefix}{i:04d}" for i in range(count)]
+    names = ["btc", "eth"][:count]
+    names += [f"c{i:04d}" for i in range(len(names), count)]
+    return names
+
+
+class FakeDeribit:
+    def __init__(self, currencies: int = 2, instruments_per_currency: int = 10,
+                 latency_ms: float = 20, jitter_ms: float = 5, error_rate: float = 0.0,
+                 seed: Optional[int] = None, prefix: Optional[str] = None):
+        self.currencies = currency_names(currencies, prefix)
+        self.instruments_per_currency = instruments_per_currency
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.prices: Dict[str, float] = {c: self.random.uniform(10, 50000) for c in self.currencies}
+        self.requests = 0
+        self.errors = 0
+        self._runner: Optional[web.AppRunner] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- Данные ----------
+
+    def _tick(self, currency: str) -> float:
+        # Случайное блуждание цены индекса
+        self.prices[currency] *= 1 + self.random.gauss(0, 0.0005)
+        return self.prices[currency]
+
+    def index_price(self, index_name: str) -> dict:
+        currency = index_name.lower().removesuffix("_usd")
+        if currency not in self.prices:
+            raise KeyError(index_name)
+        return {"index_price": round(self._tick(currency), 2), "estimated_delivery_price": self.prices[currency]}
+
+    def book_summary(self, currency: str) -> List[dict]:
+        currency = currency.lower()
+        if currency not in self.prices:
+            raise KeyError(currency)
+        index_price = self._tick(currency)
+        now_ms = int(time.time() * 1000)
+        summary = []
+        for i in range(self.instruments_per_currency):
+            mark = index_price * (1 + self.random.gauss(0, 0.01))
+            summary.append({
+                "instrument_name": f"{currency.upper()}-FAKE-{i:05d}",
+                "base_currency": currency.upper(),
+                "quote_currency": "USD",
+                "mark_price": round(mark, 4),
+                "bid_price": round(mark * 0.999, 4),
+                "ask_price": round(mark * 1.001, 4),
+                "last": round(mark, 4),
+                "underlying_price": round(index_price, 2),
+                "volume": round(self.random.uniform(0, 1000), 3),
+                "open_interest": round(self.random.uniform(0, 10000), 3),
+                "creation_timestamp": now_ms,
+            })
+        return summary
+
+    async def _simulate(self):
+        self.requests += 1
+        delay = max(self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms), 0)
+        await asyncio.sleep(delay / 1000)
+        if self.random.random() < self.error_rate:
+            self.errors += 1
+            return False
+        return True
+
+    def _call(self, method: str, params: dict):
+        if method == "public/get_index_price":
+            return self.index_price(params.get("index_name", ""))
+        if method == "public/get_book_summary_by_currency":
+            return self.book_summary(params.get("currency", ""))
+        raise LookupError(method)
+
+    # ---------- HTTP / WebSocket ----------
+
+    async def _http_handler(self, request: web.Request) -> web.Response:
+        if not await self._simulate():
+            return web.json_response({"error": {"code": 10000, "message": "fake error"}}, status=500)
+        method = request.match_info["method"]
+        try:
+            result = self._call(f"public/{method}", dict(request.query))
+        except LookupError as e:
+            return web.json_response({"error": {"code": 10001, "message": f"unknown {e}"}}, status=400)
+        return web.json_response({"jsonrpc": "2.0", "result": result, "usIn": 0, "usOut": 0})
+
+    async def _ws_handler(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        async for message in ws:
+            if message.type != WSMsgType.TEXT:
+                continue
+            payload = json.loads(message.data)
+            reply = {"jsonrpc": "2.0", "id": payload.get("id")}
+            if not await self._simulate():
+                reply["error"] = {"code": 10000, "message": "fake error"}
+            else:
+                try:
+                    reply["result"] = self._call(payload.get("method", ""), payload.get("params") or {})
+                except LookupError as e:
+                    reply["error"] = {"code": 10001, "message": f"unknown {e}"}
+            await ws.send_str(json.dumps(reply))
+        return ws
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get(API_PREFIX + "/public/{method}", self._http_handler)
+        app.router.add_get("/ws" + API_PREFIX, self._ws_handler)
+        return app
+
+    # ---------- Запуск в фоновом потоке ----------
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Запускает сервер в отдельном потоке, возвращает base_url для DERIBIT_BASE_URL"""
+        started = threading.Event()
+        address = {}
+
+        async def run():
+            self._runner = web.AppRunner(self.make_app())
+            await self._runner.setup()
+            site = web.TCPSite(self._runner, host, port)
+            await site.start()
+            address["port"] = self._runner.addresses[0][1]
+            started.set()
+
+        def target():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(run())
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=target, daemon=True)
+        self._thread.start()
+        started.wait()
+        return f"http://{host}:{address['port']}{API_PREFIX}"
+
+    def stop(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Deribit API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--currencies", type=int, default=2)
+    parser.add_argument("--instruments-per-currency", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--jitter-ms", type=float, default=5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    fake = FakeDeribit(
+        currencies=args.currencies,
+        instruments_per_currency=args.instruments_per_currency,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+    )
+    print(f"🧪 Fake Deribit on http://{args.host}:{args.port}{API_PREFIX}")
+    web.run_app(fake.make_app(), host=args.host, port=args.port)
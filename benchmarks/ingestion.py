@@ -0,0 +1,199 @@
+"""
+Нагрузочный тест пути fetch_prices -> store_prices на локальной замене Deribit.
+
+Поднимает FakeDeribit, направляет на него DERIBIT_BASE_URL и прогоняет циклы
+сбора с растущим числом индексов (--mode index) или валют с сотнями
+инструментов в каждой (--mode bulk, get_book_summary_by_currency). Для
+каждого шага считает время цикла, строки/сек и латентность COMMIT; шаг, где
+p95 цикла превышает интервал сбора, считается точкой насыщения. Результат - JSON.
+
+Запуск (нужна рабочая БД из .env):
+    python -m benchmarks.ingestion --steps 2,10,50,200 --latency-ms 50 --output bench.json
+    python -m benchmarks.ingestion --mode bulk --steps 2,5,10 --instruments-per-currency 1000
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import List
+
+from sqlalchemy import event, text
+
+from app.database import SessionLocal, engine, init_db
+from app.bulk import fetch_book_summaries
+from app.tasks import FETCH_INTERVAL, fetch_prices, sample_slot, store_prices
+from benchmarks.fake_deribit import FakeDeribit
+
+BENCH_PREFIX = "bench"
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def _summary(values: List[float]) -> dict:
+    if not values:
+        return {}
+    return {
+        "p50": round(statistics.median(values), 6),
+        "p95": round(_percentile(values, 95), 6),
+        "max": round(max(values), 6),
+    }
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def _cleanup(engine):
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM ticker_data WHERE ticker LIKE :prefix"), {"prefix": f"{BENCH_PREFIX}%"})
+
+
+def run(steps: List[int], cycles: int, interval: float, latency_ms: float, jitter_ms: float,
+        error_rate: float, stop_on_saturation: bool = True, keep_data: bool = False,
+        mode: str = "index", instruments_per_currency: int = 10) -> dict:
+    fake = FakeDeribit(
+        currencies=max(steps), instruments_per_currency=instruments_per_currency,
+        latency_ms=latency_ms, jitter_ms=jitter_ms,
+        error_rate=error_rate, seed=42, prefix=BENCH_PREFIX
+    )
+    fetch = fetch_prices if mode == "index" else fetch_book_summaries
+    # Каждому циклу свой слот (в прошлом) - иначе upsert перезапишет строки прошлого цикла
+    slot = sample_slot() - FETCH_INTERVAL * cycles * len(steps)
+    # DeribitClient читает адрес при создании, поэтому достаточно подменить переменную
+    os.environ["DERIBIT_BASE_URL"] = fake.start()
+
+    init_db()
+    _cleanup(engine)
+
+    commit_times: List[float] = []
+    commit_started = {}
+
+    def before_commit(session):
+        commit_started[id(session)] = time.perf_counter()
+
+    def after_commit(session):
+        started = commit_started.pop(id(session), None)
+        if started is not None:
+            commit_times.append(time.perf_counter() - started)
+
+    results = []
+    saturation = None
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    db = SessionLocal()
+    event.listen(db, "before_commit", before_commit)
+    event.listen(db, "after_commit", after_commit)
+    try:
+        for step in steps:
+            tickers = fake.currencies[:step]
+            cycle_times, fetch_times, store_times, rows = [], [], [], []
+            commit_times.clear()
+            errors_before = fake.errors
+
+            for _ in range(cycles):
+                started = time.perf_counter()
+                prices_data = loop.run_until_complete(fetch(tickers, slot))
+                slot += FETCH_INTERVAL
+                fetched = time.perf_counter()
+                store_prices(db, prices_data, verbose=False)
+                finished = time.perf_counter()
+
+                fetch_times.append(fetched - started)
+                store_times.append(finished - fetched)
+                cycle_times.append(finished - started)
+                rows.append(len(prices_data))
+
+            p95 = _percentile(cycle_times, 95)
+            step_result = {
+                "currencies": step,
+                "cycles": cycles,
+                "cycle_s": _summary(cycle_times),
+                "fetch_s": _summary(fetch_times),
+                "store_s": _summary(store_times),
+                "commit_s": _summary(commit_times),
+                "rows_per_cycle": statistics.mean(rows),
+                "rows_per_sec": round(sum(rows) / sum(cycle_times), 2),
+                "fetch_errors": fake.errors - errors_before,
+                "saturated": p95 > interval,
+            }
+            results.append(step_result)
+            print(f"⏱️  {step} currencies: cycle p95 {p95:.3f}s, "
+                  f"{step_result['rows_per_sec']} rows/s, commit p50 {step_result['commit_s'].get('p50')}s",
+                  file=sys.stderr)
+
+            if step_result["saturated"] and saturation is None:
+                saturation = step
+                if stop_on_saturation:
+                    break
+    finally:
+        db.close()
+        loop.close()
+        if not keep_data:
+            _cleanup(engine)
+        fake.stop()
+
+    return {
+        "benchmark": "ingestion",
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "git_revision": _git_revision(),
+        "config": {
+            "mode": mode,
+            "instruments_per_currency": instruments_per_currency if mode == "bulk" else None,
+            "steps": steps,
+            "cycles": cycles,
+            "interval_s": interval,
+            "latency_ms": latency_ms,
+            "jitter_ms": jitter_ms,
+            "error_rate": error_rate,
+        },
+        "steps": results,
+        "saturation_currencies": saturation,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingestion throughput benchmark against a fake Deribit")
+    parser.add_argument("--mode", choices=["index", "bulk"], default="index",
+                        help="index - get_index_price на индекс, bulk - get_book_summary_by_currency на валюту")
+    parser.add_argument("--steps", default="2,10,50,200,1000", help="Число индексов (валют) на каждом шаге")
+    parser.add_argument("--instruments-per-currency", type=int, default=10, help="Инструментов в валюте для bulk")
+    parser.add_argument("--cycles", type=int, default=3, help="Циклов сбора на шаг")
+    parser.add_argument("--interval", type=float, default=60, help="Интервал сбора, сек (порог насыщения)")
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=10)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--no-stop", action="store_true", help="Продолжать после насыщения")
+    parser.add_argument("--keep-data", action="store_true", help="Не удалять тестовые строки")
+    parser.add_argument("--output", help="Файл для JSON; по умолчанию stdout")
+    args = parser.parse_args()
+
+    report = run(
+        steps=[int(s) for s in args.steps.split(",")],
+        cycles=args.cycles,
+        interval=args.interval,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        stop_on_saturation=not args.no_stop,
+        keep_data=args.keep_data,
+        mode=args.mode,
+        instruments_per_currency=args.instruments_per_currency,
+    )
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
@@ -0,0 +1,149 @@
+from app import models
+from app.alerts import AlertEngine, AlertIndex
+
+
+def _rule(rule_id, kind, threshold, ticker="btc_usd", window_minutes=None):
+    return models.AlertRule(
+        id=rule_id, ticker=ticker, kind=kind, threshold=threshold, window_minutes=window_minutes, active=True
+    )
+
+
+def _index():
+    return AlertIndex([
+        _rule(1, "cross_above", 100.0),
+        _rule(2, "cross_above", 110.0),
+        _rule(3, "cross_below", 90.0),
+        _rule(4, "cross_below", 80.0),
+        _rule(5, "move_pct", 5.0, window_minutes=60),
+        _rule(6, "move_pct", 10.0, window_minutes=60),
+        _rule(7, "move_pct", 2.0, window_minutes=15),
+        _rule(8, "cross_above", 100.0, ticker="eth_usd"),
+    ])
+
+
+def test_cross_above_fires_when_price_reaches_threshold():
+    # prev < X <= price
+    assert _index().crossed("btc_usd", 99.0, 100.0) == [1]
+
+
+def test_cross_above_skips_threshold_equal_to_previous_price():
+    assert _index().crossed("btc_usd", 100.0, 105.0) == []
+
+
+def test_cross_above_collects_all_crossed_thresholds_in_order():
+    assert _index().crossed("btc_usd", 95.0, 110.0) == [1, 2]
+
+
+def test_cross_below_fires_when_price_reaches_threshold():
+    # price <= X < prev
+    assert _index().crossed("btc_usd", 91.0, 90.0) == [3]
+
+
+def test_cross_below_skips_threshold_equal_to_previous_price():
+    assert _index().crossed("btc_usd", 90.0, 85.0) == []
+
+
+def test_cross_below_collects_all_crossed_thresholds_in_order():
+    assert _index().crossed("btc_usd", 95.0, 80.0) == [4, 3]
+
+
+def test_unchanged_price_crosses_nothing():
+    assert _index().crossed("btc_usd", 100.0, 100.0) == []
+
+
+def test_crossed_is_per_ticker():
+    index = _index()
+    assert index.crossed("eth_usd", 99.0, 101.0) == [8]
+    assert index.crossed("sol_usd", 99.0, 101.0) == []
+
+
+def test_moved_includes_threshold_equal_to_move():
+    assert _index().moved("btc_usd", 60, 5.0) == [5]
+
+
+def test_moved_excludes_thresholds_above_move():
+    index = _index()
+    assert index.moved("btc_usd", 60, 4.99) == []
+    assert index.moved("btc_usd", 60, 10.0) == [5, 6]
+
+
+def test_moved_uses_only_rules_of_the_window():
+    assert _index().moved("btc_usd", 15, 3.0) == [7]
+
+
+def test_windows_and_tickers():
+    index = _index()
+    assert sorted(index.windows("btc_usd")) == [15, 60]
+    assert index.windows("eth_usd") == []
+    assert index.tickers == {"btc_usd", "eth_usd"}
+
+
+class _FakeVersionDb:
+    """Заглушка сессии: AlertEngine трогает ее только через crud"""
+
+    def expunge(self, rule):
+        pass
+
+
+def test_engine_reloads_rules_only_when_version_changes(monkeypatch):
+    from app import alerts
+
+    state = {"version": 1, "loads": 0}
+
+    def get_rules(db, active_only=False):
+        state["loads"] += 1
+        return [_rule(1, "cross_above", 100.0)]
+
+    monkeypatch.setattr(alerts.crud, "get_alert_rules_version", lambda db: state["version"])
+    monkeypatch.setattr(alerts.crud, "get_alert_rules", get_rules)
+
+    engine = AlertEngine()
+    db = _FakeVersionDb()
+    assert engine.watched(db) == {"btc_usd"}
+    engine.watched(db)
+    assert state["loads"] == 1
+
+    state["version"] = 2
+    engine.watched(db)
+    assert state["loads"] == 2
+
+
+class _RecordingSink:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.sent = []
+
+    def send(self, alerts):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("webhook is down")
+        self.sent.append(alerts)
+
+
+def test_evaluate_returns_alerts_without_sending(monkeypatch):
+    from app import alerts
+
+    monkeypatch.setattr(alerts.crud, "get_alert_rules_version", lambda db: 1)
+    monkeypatch.setattr(alerts.crud, "get_alert_rules", lambda db, active_only=False: [_rule(1, "cross_above", 100.0)])
+    monkeypatch.setattr(alerts.crud, "mark_alert_rules_triggered", lambda db, ids, ts: list(ids))
+
+    sink = _RecordingSink()
+    engine = AlertEngine(sink=sink)
+    fired = engine.evaluate(_FakeVersionDb(), "btc_usd", 99.0, 101.0, 1_700_000_000)
+    assert [alert["rule_id"] for alert in fired] == [1]
+    assert fired[0]["alert_id"] == "1-1700000000"
+    # Отправка - только через deliver (задача Celery), не из цикла сбора
+    assert sink.sent == []
+    engine.deliver(fired)
+    assert sink.sent == [fired]
+
+
+def test_delivery_task_retries_failed_send(monkeypatch):
+    from app import tasks
+
+    sink = _RecordingSink(failures=2)
+    monkeypatch.setattr(tasks.alert_engine, "_sink", sink)
+    alerts = [{"alert_id": "1-60", "rule_id": 1}]
+    result = tasks.deliver_alerts.apply(args=[alerts])
+    assert result.successful()
+    assert sink.sent == [alerts]
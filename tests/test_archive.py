@@ -0,0 +1,113 @@
+import os
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from app.archive import SCHEMA, VERSION_FILE_NAME, ArchiveStore, _write_month, archive_old_rows
+
+CREATED = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def make_table(rows):
+    """rows: [(id, price, timestamp)]"""
+    ids, prices, timestamps = zip(*rows) if rows else ((), (), ())
+    return pa.table([
+        pa.array(ids, pa.int64()),
+        pa.array(prices, pa.float64()),
+        pa.array(timestamps, pa.int64()),
+        pa.array([CREATED] * len(rows), pa.timestamp("us", tz="UTC")),
+    ], schema=SCHEMA)
+
+
+def write(root, ticker, month, rows):
+    _write_month(root / ticker / f"{month}.parquet", make_table(rows))
+    (root / VERSION_FILE_NAME).touch()
+
+
+def read(path):
+    table = pq.read_table(path)
+    return list(zip(table.column("id").to_pylist(), table.column("price").to_pylist(),
+                    table.column("timestamp").to_pylist()))
+
+
+def test_write_month_sorts_and_merges(tmp_path):
+    path = tmp_path / "btc_usd" / "2024-01.parquet"
+    _write_month(path, make_table([(3, 3.0, 300), (1, 1.0, 100)]))
+    _write_month(path, make_table([(2, 2.0, 200), (4, 4.0, 400)]))
+    assert read(path) == [(1, 1.0, 100), (2, 2.0, 200), (3, 3.0, 300), (4, 4.0, 400)]
+    assert not path.with_suffix(".parquet.tmp").exists()
+
+
+def test_write_month_dedup_keeps_newest_row(tmp_path):
+    path = tmp_path / "btc_usd" / "2024-01.parquet"
+    _write_month(path, make_table([(1, 1.0, 100), (2, 2.0, 200)]))
+    # Повторно записанный слот: новая строка с тем же timestamp заменяет архивную
+    _write_month(path, make_table([(7, 2.5, 200), (8, 8.0, 200), (3, 3.0, 300)]))
+    assert read(path) == [(1, 1.0, 100), (8, 8.0, 200), (3, 3.0, 300)]
+
+
+def test_read_desc_pages_across_files(tmp_path):
+    write(tmp_path, "btc_usd", "2024-01", [(i, float(i), i) for i in range(1, 6)])
+    write(tmp_path, "btc_usd", "2024-02", [(i, float(i), i) for i in range(6, 9)])
+    store = ArchiveStore(tmp_path)
+    assert store.count("btc_usd") == 8
+
+    pages = [[row.timestamp for row in store.read_desc("btc_usd", skip, 3)] for skip in (0, 3, 6, 9)]
+    assert pages == [[8, 7, 6], [5, 4, 3], [2, 1], []]
+    # Страница внутри одного файла после пропуска целого
+    assert [row.timestamp for row in store.read_desc("btc_usd", 4, 2)] == [4, 3]
+    assert store.read_desc("eth_usd", 0, 3) == []
+
+
+def test_nearest_tie_prefers_later_row(tmp_path):
+    write(tmp_path, "btc_usd", "2024-01", [(1, 1.0, 100), (2, 2.0, 200)])
+    write(tmp_path, "btc_usd", "2024-02", [(3, 3.0, 300)])
+    store = ArchiveStore(tmp_path)
+    assert store.nearest("btc_usd", 150).timestamp == 200
+    assert store.nearest("btc_usd", 149).timestamp == 100
+    # Равноудаленные строки в разных файлах
+    assert store.nearest("btc_usd", 250).timestamp == 300
+    assert store.nearest("btc_usd", 10).timestamp == 100
+    assert store.nearest("btc_usd", 10_000).timestamp == 300
+    assert store.nearest("eth_usd", 100) is None
+
+
+def test_distance(tmp_path):
+    write(tmp_path, "btc_usd", "2024-01", [(1, 1.0, 100), (2, 2.0, 200)])
+    store = ArchiveStore(tmp_path)
+    assert store.distance("btc_usd", 100) == 0
+    assert store.distance("btc_usd", 150) == 0
+    assert store.distance("btc_usd", 40) == 60
+    assert store.distance("btc_usd", 230) == 30
+    assert store.distance("eth_usd", 100) is None
+
+
+def test_new_files_visible_after_version_bump(tmp_path):
+    write(tmp_path, "btc_usd", "2024-01", [(1, 1.0, 100)])
+    store = ArchiveStore(tmp_path)
+    assert store.count("btc_usd") == 1
+    write(tmp_path, "btc_usd", "2024-02", [(2, 2.0, 200)])
+    version = tmp_path / VERSION_FILE_NAME
+    stat = version.stat()
+    # mtime может совпасть в пределах разрешения ФС - сдвигаем явно
+    os.utime(version, (stat.st_atime, stat.st_mtime + 1))
+    assert store.count("btc_usd") == 2
+
+
+def test_store_without_dir_is_empty():
+    store = ArchiveStore(None)
+    assert store.count("btc_usd") == 0
+    assert store.nearest("btc_usd", 100) is None
+    assert store.read_desc("btc_usd", 0, 10) == []
+
+
+def test_refuses_to_run_without_archive_dir():
+    with pytest.raises(RuntimeError, match="ARCHIVE_DIR"):
+        archive_old_rows(days=90, root=None)
+
+
+def test_refuses_non_positive_days(tmp_path):
+    with pytest.raises(ValueError):
+        archive_old_rows(days=0, root=tmp_path)
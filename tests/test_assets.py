@@ -0,0 +1,56 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.assets import IMMUTABLE, REVALIDATE, STATIC_URL, AssetStore, PrecompressedStaticFiles
+
+
+def make_client(tmp_path):
+    (tmp_path / "app.js").write_text("console.log('dashboard');\n" * 50)
+    (tmp_path / "index.html").write_text('<script src="{{ app.js }}"></script>')
+    store = AssetStore(tmp_path)
+    store.load()
+    app = FastAPI()
+    app.mount(STATIC_URL, PrecompressedStaticFiles(store), name="static")
+    return TestClient(app), store
+
+
+def test_current_hash_is_immutable(tmp_path):
+    client, store = make_client(tmp_path)
+    asset = store.get("app.js")
+    response = client.get(f"{STATIC_URL}/app.js?v={asset.hash}")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == IMMUTABLE
+    assert f"?v={asset.hash}" in store.get("index.html").variants["identity"].decode()
+
+
+def test_stale_or_missing_hash_revalidates(tmp_path):
+    client, _ = make_client(tmp_path)
+    for url in (f"{STATIC_URL}/app.js", f"{STATIC_URL}/app.js?v=0123456789abcdef"):
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.headers["cache-control"] == REVALIDATE
+
+
+def test_not_modified_for_any_variant(tmp_path):
+    client, store = make_client(tmp_path)
+    asset = store.get("app.js")
+    response = client.get(f"{STATIC_URL}/app.js", headers={"If-None-Match": asset.etag("gzip")})
+    assert response.status_code == 304
+
+
+def test_gzip_variant(tmp_path):
+    client, store = make_client(tmp_path)
+    response = client.get(f"{STATIC_URL}/app.js", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.content == store.get("app.js").variants["identity"]
+
+
+def test_only_get_and_head(tmp_path):
+    client, _ = make_client(tmp_path)
+    assert client.head(f"{STATIC_URL}/app.js").status_code == 200
+    assert client.post(f"{STATIC_URL}/app.js").status_code == 405
+    assert client.delete(f"{STATIC_URL}/app.js").status_code == 405
+    # Файлы вне кэша ассетов - тоже через проверку StaticFiles
+    (tmp_path / "extra.txt").write_text("extra")
+    assert client.post(f"{STATIC_URL}/extra.txt").status_code == 405
+    assert client.get(f"{STATIC_URL}/extra.txt").status_code == 200
@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from app.bulk import BookSummaryParser, HashRing, assign_shards, shard_name
+
+ITEMS = [
+    {"instrument_name": f"BTC-{i}JUN26-{60000 + i * 1000}-C", "mark_price": 0.01 * i, "comment": "цена ₿ 🚀"}
+    for i in range(50)
+]
+BODY = json.dumps({"jsonrpc": "2.0", "result": ITEMS, "usIn": 1, "usOut": 2}, ensure_ascii=False).encode()
+
+
+def parse(body: bytes, chunk_size: int):
+    parser = BookSummaryParser()
+    items = []
+    for i in range(0, len(body), chunk_size):
+        items.extend(parser.feed(body[i:i + chunk_size]))
+    parser.close()
+    return items
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, 64 * 1024])
+def test_parser_any_chunk_boundaries(chunk_size):
+    assert parse(BODY, chunk_size) == ITEMS
+
+
+def test_parser_multibyte_split_across_chunks():
+    body = json.dumps({"result": [{"instrument_name": "₿"}]}, ensure_ascii=False).encode()
+    split = body.index("₿".encode()) + 1  # посреди трехбайтового символа
+    parser = BookSummaryParser()
+    assert parser.feed(body[:split]) == []
+    assert parser.feed(body[split:]) == [{"instrument_name": "₿"}]
+    parser.close()
+
+
+def test_parser_empty_result():
+    assert parse(b'{"result": []}', 3) == []
+
+
+def test_parser_error_envelope():
+    body = json.dumps({"jsonrpc": "2.0", "error": {"code": 10047, "message": "currency not found"}}).encode()
+    with pytest.raises(Exception, match="currency not found"):
+        parse(body, 5)
+
+
+def test_parser_truncated_response():
+    with pytest.raises(Exception, match="Truncated"):
+        parse(BODY[:len(BODY) // 2], 64)
+
+
+def test_ring_reshard_moves_keys_only_to_new_node():
+    keys = [f"CUR{i}" for i in range(2000)]
+    old = HashRing([shard_name(i) for i in range(4)])
+    new = HashRing([shard_name(i) for i in range(5)])
+    moved = [key for key in keys if old.node_for(key) != new.node_for(key)]
+    assert all(new.node_for(key) == shard_name(4) for key in moved)
+    # В среднем переезжает 1/5 ключей
+    assert 0.1 < len(moved) / len(keys) < 0.3
+
+
+def test_assign_shards_covers_every_currency_once():
+    currencies = ["BTC", "ETH", "SOL", "USDC", "USDT", "EURR"]
+    assignment = assign_shards(currencies, shards=3)
+    assert sorted(c for batch in assignment.values() for c in batch) == sorted(currencies)
+    assert assign_shards(currencies, shards=3) == assignment
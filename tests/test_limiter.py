@@ -0,0 +1,213 @@
+import asyncio
+import time
+
+from app.limiter import HIGH, LOW, NORMAL, AdaptiveLimiter, route_priority
+
+
+def make_limiter(**kwargs):
+    options = {"initial": 10, "min_limit": 2, "max_limit": 20, "queue_timeout": 1.0}
+    options.update(kwargs)
+    return AdaptiveLimiter(**options)
+
+
+def fill(limiter, count):
+    for _ in range(count):
+        assert asyncio.run(limiter.acquire(HIGH))
+
+
+async def settle():
+    # Выданное место доходит до ожидающего через несколько итераций цикла (shield, wait_for)
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def test_route_priority():
+    assert route_priority("/api/ticker/latest") == HIGH
+    assert route_priority("/api/ticker/data") == LOW
+    assert route_priority("/api/alerts") == NORMAL
+    assert route_priority("/api/stats/limiter") is None
+    assert route_priority("/health") is None
+
+
+def test_high_waiter_dispatched_before_normal():
+    async def scenario():
+        limiter = make_limiter(initial=2)
+        assert await limiter.acquire(HIGH)
+        assert await limiter.acquire(HIGH)
+        order = []
+
+        async def request(priority, name):
+            if await limiter.acquire(priority):
+                order.append(name)
+
+        normal = asyncio.create_task(request(NORMAL, "normal"))
+        await asyncio.sleep(0)
+        high = asyncio.create_task(request(HIGH, "high"))
+        await asyncio.sleep(0)
+        # Освободилось одно место - его получает high, хотя normal ждет дольше
+        limiter.release("/api/ticker/latest", HIGH, 0.0, None)
+        await settle()
+        assert order == ["high"]
+        # normal допускается только в пределах своей доли лимита (1 из 2)
+        limiter.release("/api/ticker/latest", HIGH, 0.0, None)
+        await settle()
+        assert order == ["high"]
+        limiter.release("/api/ticker/latest", HIGH, 0.0, None)
+        await asyncio.gather(normal, high)
+        assert order == ["high", "normal"]
+        assert limiter.inflight == 1
+
+    asyncio.run(scenario())
+
+
+def overload(limiter):
+    """Доводит лимит до снижения медленным ответом high при полной загрузке"""
+    fill(limiter, int(limiter.limit))
+    started = time.perf_counter()
+    limiter.release("/api/ticker/latest", HIGH, started, 0.01)
+    fill(limiter, 1)
+    limiter.release("/api/ticker/latest", HIGH, started, 1.0)
+    while limiter.inflight:
+        limiter.release("/api/ticker/latest", HIGH, started, None)
+    assert limiter.overloaded()
+
+
+def test_concurrent_fast_low_admitted_when_idle():
+    # Дефолтная конфигурация: начальный лимит - размер пула (5), low - половина
+    limiter = AdaptiveLimiter(initial=5, min_limit=2, max_limit=15)
+    for _ in range(1000):
+        for _ in range(3):
+            assert asyncio.run(limiter.acquire(LOW))
+        for _ in range(3):
+            limiter.release("/api/ticker/data", LOW, time.perf_counter(), 0.002)
+    assert limiter.stats()["classes"]["low"]["rejected"] == 0
+    assert not limiter.overloaded()
+
+
+def test_low_rejected_over_its_share_when_overloaded():
+    limiter = make_limiter(initial=10)
+    overload(limiter)
+    share = limiter.capacity(LOW)
+    assert share == int(limiter.limit * 0.5)
+    for _ in range(share):
+        assert asyncio.run(limiter.acquire(LOW))
+    assert not asyncio.run(limiter.acquire(LOW))
+    assert limiter.stats()["classes"]["low"]["rejected"] == 1
+    # Старшие классы доступ к остатку лимита сохраняют
+    assert asyncio.run(limiter.acquire(HIGH))
+
+
+def test_overload_expires_after_window():
+    limiter = make_limiter(initial=10, overload_window=0.0)
+    overload_started = time.perf_counter()
+    fill(limiter, 10)
+    limiter.release("/api/ticker/latest", HIGH, overload_started, 0.01)
+    fill(limiter, 1)
+    limiter.release("/api/ticker/latest", HIGH, overload_started, 1.0)
+    assert limiter.overloaded()  # последний ответ медленный
+    limiter.release("/api/ticker/latest", HIGH, time.perf_counter(), 0.01)
+    assert not limiter.overloaded()
+    assert limiter.capacity(LOW) == 10
+
+
+def test_queue_timeout_returns_false_without_leak():
+    async def scenario():
+        limiter = make_limiter(initial=2, queue_timeout=0.01)
+        assert await limiter.acquire(HIGH)
+        assert await limiter.acquire(HIGH)
+        assert not await limiter.acquire(NORMAL)
+        assert limiter.inflight == 2
+        assert limiter.stats()["waiting"] == 0
+        assert limiter.stats()["classes"]["normal"]["timed_out"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_cancel_while_queued_does_not_leak_slot():
+    async def scenario():
+        limiter = make_limiter(initial=2)
+        assert await limiter.acquire(HIGH)
+        assert await limiter.acquire(HIGH)
+        waiter = asyncio.create_task(limiter.acquire(HIGH))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert limiter.stats()["waiting"] == 0
+        limiter.release("/api/ticker/latest", HIGH, 0.0, None)
+        assert limiter.inflight == 1
+
+    asyncio.run(scenario())
+
+
+def test_cancel_after_dispatch_returns_slot():
+    async def scenario():
+        limiter = make_limiter(initial=2)
+        assert await limiter.acquire(HIGH)
+        assert await limiter.acquire(HIGH)
+        waiter = asyncio.create_task(limiter.acquire(HIGH))
+        await asyncio.sleep(0)
+        # Место выдано, но клиент ушел раньше, чем acquire вернулся
+        limiter.release("/api/ticker/latest", HIGH, 0.0, None)
+        waiter.cancel()
+        result, = await asyncio.gather(waiter, return_exceptions=True)
+        if result is True:
+            # wait_for успел вернуть результат вместо отмены - место у вызывающего,
+            # он обязан его освободить
+            limiter.release("/api/ticker/latest", HIGH, 0.0, None)
+        else:
+            assert isinstance(result, asyncio.CancelledError)
+        assert limiter.inflight == 1
+
+    asyncio.run(scenario())
+
+
+def test_increase_when_utilized():
+    limiter = make_limiter(initial=10)
+    fill(limiter, 6)
+    for _ in range(5):
+        limiter.release("/api/ticker/latest", HIGH, time.perf_counter(), 0.01)
+        fill(limiter, 1)
+    assert limiter.limit > 10
+
+
+def test_no_change_when_idle():
+    limiter = make_limiter(initial=10)
+    fill(limiter, 1)
+    limiter.release("/api/ticker/latest", HIGH, time.perf_counter(), 0.01)
+    fill(limiter, 1)
+    # Медленный ответ при почти пустом лимите - не перегрузка
+    limiter.release("/api/ticker/latest", HIGH, time.perf_counter(), 1.0)
+    assert limiter.limit == 10
+
+
+def test_backoff_when_loaded_once_per_generation():
+    limiter = make_limiter(initial=10)
+    fill(limiter, 10)
+    started = time.perf_counter()
+    limiter.release("/api/ticker/latest", HIGH, started, 0.01)
+    fill(limiter, 1)
+    limiter.release("/api/ticker/latest", HIGH, started, 1.0)
+    reduced = limiter.limit
+    assert reduced < 10
+    # Запрос начат до снижения - повторно не снижаем
+    limiter.release("/api/ticker/latest", HIGH, started, 1.0)
+    assert limiter.limit == reduced
+
+
+def test_low_samples_ignored():
+    limiter = make_limiter(initial=10)
+    fill(limiter, 10)
+    started = time.perf_counter()
+    limiter.release("/api/ticker/data", LOW, started, 0.001)
+    fill(limiter, 1)
+    limiter.release("/api/ticker/data", LOW, started, 5.0)
+    assert limiter.limit == 10
+
+
+def test_sequential_mixed_depth_keeps_limit():
+    # 200 последовательных запросов, каждый четвертый - тяжелый
+    limiter = make_limiter(initial=15, max_limit=15)
+    for i in range(200):
+        assert asyncio.run(limiter.acquire(NORMAL))
+        limiter.release("/api/alerts", NORMAL, time.perf_counter(), 0.5 if i % 4 == 0 else 0.01)
+    assert limiter.limit == 15
@@ -0,0 +1,149 @@
+import threading
+import time
+
+import pytest
+
+from app.singleflight import SingleFlight
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.001)
+
+
+def run_concurrently(flight, fn, args_list):
+    """Запускает вызовы в потоках; fn блокируется, пока все не встанут в ожидание"""
+    results = [None] * len(args_list)
+    errors = [None] * len(args_list)
+
+    def worker(i, args):
+        try:
+            results[i] = flight.do(fn, None, *args)
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i, args)) for i, args in enumerate(args_list)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+def test_concurrent_identical_calls_execute_once():
+    flight = SingleFlight()
+    release = threading.Event()
+    executions = []
+
+    def query(db, ticker, limit=10):
+        executions.append(ticker)
+        release.wait(5)
+        return [ticker] * limit
+
+    threads, results, errors = run_concurrently(flight, query, [("btc_usd",)] * 8)
+    # Все 8 вызовов вошли: один выполняет, семь ждут его результата
+    wait_for(lambda: flight.stats()["calls"] == 8)
+    assert flight.stats()["in_flight"] == 1
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert executions == ["btc_usd"]
+    assert errors == [None] * 8
+    assert all(result == ["btc_usd"] * 10 for result in results)
+    # Все получают один и тот же объект
+    assert len({id(result) for result in results}) == 1
+    assert flight.stats() == {"calls": 8, "executed": 1, "coalesced": 7, "in_flight": 0}
+
+
+def test_exception_reaches_every_waiter():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def query(db, ticker):
+        release.wait(5)
+        raise RuntimeError("connection lost")
+
+    threads, results, errors = run_concurrently(flight, query, [("btc_usd",)] * 5)
+    wait_for(lambda: flight.stats()["calls"] == 5)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert all(isinstance(error, RuntimeError) and str(error) == "connection lost" for error in errors)
+    assert flight.stats()["executed"] == 1
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_different_args_are_not_merged():
+    flight = SingleFlight()
+    release = threading.Event()
+    executions = []
+    lock = threading.Lock()
+
+    def query(db, ticker, tickers=None):
+        with lock:
+            executions.append((ticker, tuple(tickers or ())))
+        release.wait(5)
+        return ticker
+
+    args_list = [("btc_usd",), ("eth_usd",), ("btc_usd", ["a"]), ("btc_usd", ["b"])]
+    threads, results, errors = run_concurrently(flight, query, args_list)
+    wait_for(lambda: flight.stats()["in_flight"] == 4)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert sorted(executions) == [("btc_usd", ()), ("btc_usd", ("a",)), ("btc_usd", ("b",)), ("eth_usd", ())]
+    assert results == ["btc_usd", "eth_usd", "btc_usd", "btc_usd"]
+    assert flight.stats()["coalesced"] == 0
+
+
+def test_same_args_from_different_functions_are_not_merged():
+    flight = SingleFlight()
+
+    def latest(db, ticker):
+        return "latest"
+
+    def history(db, ticker):
+        return "history"
+
+    assert flight.do(latest, None, "btc_usd") == "latest"
+    assert flight.do(history, None, "btc_usd") == "history"
+
+
+def test_entry_cleared_after_completion():
+    flight = SingleFlight()
+    counter = {"calls": 0}
+
+    def query(db, ticker):
+        counter["calls"] += 1
+        return counter["calls"]
+
+    # Последовательные вызовы не объединяются - каждый идет в БД заново
+    assert flight.do(query, None, "btc_usd") == 1
+    assert flight.do(query, None, "btc_usd") == 2
+    assert flight.stats() == {"calls": 2, "executed": 2, "coalesced": 0, "in_flight": 0}
+
+
+def test_entry_cleared_after_error():
+    flight = SingleFlight()
+
+    def failing(db, ticker):
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        flight.do(failing, None, "btc_usd")
+    assert flight.stats()["in_flight"] == 0
+    with pytest.raises(ValueError):
+        flight.do(failing, None, "btc_usd")
+    assert flight.stats()["executed"] == 2
+
+
+def test_unhashable_args_are_frozen():
+    flight = SingleFlight()
+
+    def query(db, tickers, options):
+        return (tuple(tickers), options["limit"])
+
+    assert flight.do(query, None, ["btc_usd", "eth_usd"], {"limit": 5}) == (("btc_usd", "eth_usd"), 5)
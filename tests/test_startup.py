@@ -0,0 +1,39 @@
+from app import startup
+
+
+def test_retries_until_ready(monkeypatch):
+    attempts = []
+
+    def init_db():
+        attempts.append("init")
+        if len(attempts) < 3:
+            raise ConnectionError("db is down")
+
+    monkeypatch.setattr(startup, "state", startup.Readiness())
+    monkeypatch.setattr(startup, "init_db", init_db)
+    monkeypatch.setattr(startup, "warm_up", lambda tickers: attempts.append("warm"))
+    monkeypatch.setattr(startup.time, "sleep", lambda seconds: None)
+
+    startup.prepare(["btc_usd"], retry_interval=0)
+    assert attempts == ["init", "init", "init", "warm"]
+    assert startup.state.ready
+    assert startup.state.error is None
+
+
+def test_warm_up_failure_is_retried(monkeypatch):
+    calls = []
+
+    def warm_up(tickers):
+        calls.append(tickers)
+        if len(calls) == 1:
+            raise TimeoutError("pool timeout")
+        assert startup.state.status == "error"
+
+    monkeypatch.setattr(startup, "state", startup.Readiness())
+    monkeypatch.setattr(startup, "init_db", lambda: None)
+    monkeypatch.setattr(startup, "warm_up", warm_up)
+    monkeypatch.setattr(startup.time, "sleep", lambda seconds: None)
+
+    startup.prepare(["btc_usd"], retry_interval=0)
+    assert len(calls) == 2
+    assert startup.state.ready